@@ -0,0 +1,66 @@
+# astra_client.py
+import os
+from functools import lru_cache
+import importlib.util
+import httpx
+from astrapy import DataAPIClient
+from astrapy.api_options import APIOptions, TimeoutOptions
+from astrapy.utils import api_commander as _api_commander
+
+# Shared, memoized Data API handles. Credentials are read from the environment
+# at call time (ensure_db() may set them after import) and form part of the
+# cache key, so a new endpoint/token gets its own client instead of a stale one.
+
+# astrapy gives each collection its own default httpx.Client (HTTP/1.1, 20
+# keep-alive slots expiring after 5 s). Between pipeline pages or chat turns
+# that expiry lapses and the next call pays a fresh TLS handshake; HTTP/2
+# multiplexes the concurrent upload/search calls over one connection instead.
+ASTRA_HTTP2 = os.getenv("ASTRA_HTTP2", "1") != "0" and importlib.util.find_spec("h2") is not None
+ASTRA_HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60)
+
+def use_http2(collection):
+    """Swap the collection's sync transport for a long-lived HTTP/2 pool.
+
+    astrapy has no hook for passing in a client, so this replaces the one on
+    its API commander. Left alone when h2 isn't installed, when a custom CA
+    is configured, or on the Python versions where astrapy disables
+    connection reuse for an SSL bug.
+    """
+    commander = collection._api_commander
+    if not ASTRA_HTTP2 or _api_commander.disable_ssl_reuse or commander.ca_cert_path:
+        return collection
+    old = commander.client
+    commander.client = httpx.Client(
+        http2=True, limits=ASTRA_HTTP_LIMITS, verify=_api_commander.CLIENT_SSL_CONTEXT,
+    )
+    old.close()
+    return collection
+
+# Bound each request so a stalled call fails fast (query_astra_llm retries
+# transient failures); 10 s is also astrapy's own default
+ASTRA_REQUEST_TIMEOUT_MS = int(os.getenv("ASTRA_REQUEST_TIMEOUT_MS", "10000"))
+
+@lru_cache(maxsize=None)
+def _client(token: str) -> DataAPIClient:
+    return DataAPIClient(
+        token,
+        api_options=APIOptions(timeout_options=TimeoutOptions(request_timeout_ms=ASTRA_REQUEST_TIMEOUT_MS)),
+    )
+
+@lru_cache(maxsize=None)
+def _database(token: str, endpoint: str):
+    return _client(token).get_database_by_api_endpoint(endpoint)
+
+@lru_cache(maxsize=None)
+def _collection(token: str, endpoint: str, name: str):
+    return use_http2(_database(token, endpoint).get_collection(name))
+
+def get_client() -> DataAPIClient:
+    return _client(os.getenv("ASTRA_DB_APPLICATION_TOKEN"))
+
+def get_database():
+    return _database(os.getenv("ASTRA_DB_APPLICATION_TOKEN"), os.getenv("ASTRA_DB_API_ENDPOINT"))
+
+def get_collection(name: str | None = None):
+    name = name or os.getenv("ASTRA_COLLECTION_NAME", "chatbot_chunks")
+    return _collection(os.getenv("ASTRA_DB_APPLICATION_TOKEN"), os.getenv("ASTRA_DB_API_ENDPOINT"), name)
@@ -1,7 +1,9 @@
 # astra_db_manager.py
-import os, sys, time, requests
+import os, sys, time, random, functools, requests
 from urllib.parse import urlparse
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 load_dotenv()
 
@@ -17,11 +19,21 @@ if not ASTRA_DEVOPS_TOKEN:
 
 DEVOPS_BASE = "https://api.astra.datastax.com/v2"
 
-def _headers():
-    h = {"Authorization": f"Bearer {ASTRA_DEVOPS_TOKEN}", "Content-Type": "application/json"}
-    if ASTRA_ORG_ID:
-        h["X-DataStax-Current-Org"] = ASTRA_ORG_ID
-    return h
+# Built once: the token and org id don't change for the life of the process
+_HEADERS = {
+    "Authorization": f"Bearer {ASTRA_DEVOPS_TOKEN}",
+    "Content-Type": "application/json",
+    **({"X-DataStax-Current-Org": ASTRA_ORG_ID} if ASTRA_ORG_ID else {}),
+}
+
+# One pooled keep-alive session for all DevOps API calls
+_SESSION = requests.Session()
+_SESSION.headers.update(_HEADERS)
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504)),
+))
 
 def extract_db_name(start_url: str) -> str:
     netloc = urlparse(start_url).netloc or start_url
@@ -34,36 +46,57 @@ def extract_db_name(start_url: str) -> str:
 
 # ── DB lifecycle ──────────────────────────────────────────────────────────────
 def list_dbs():
-    r = requests.get(f"{DEVOPS_BASE}/databases", headers=_headers(), timeout=30)
+    r = _SESSION.get(f"{DEVOPS_BASE}/databases", timeout=30)
     r.raise_for_status()
     body = r.json()
     return body["data"] if isinstance(body, dict) and "data" in body else body
 
-def find_existing_db(name: str):
+DBS_CACHE_TTL = 30  # seconds a list_dbs() snapshot is reused for name lookups
+
+@functools.lru_cache(maxsize=1)
+def _dbs_snapshot(ts_bucket: int) -> dict:
+    """name → db from one list_dbs() call; ts_bucket rolls over every DBS_CACHE_TTL s."""
+    index = {}
     for db in list_dbs() or []:
         info = db.get("info", {}) or {}
-        if (info.get("name") or db.get("name")) == name:
-            return db
-    return None
+        index.setdefault(info.get("name") or db.get("name"), db)  # first match wins
+    return index
+
+def find_existing_db(name: str, fresh: bool = False):
+    if fresh:
+        _dbs_snapshot.cache_clear()
+    return _dbs_snapshot(int(time.time()) // DBS_CACHE_TTL).get(name)
 
 def get_db(db_id: str):
-    r = requests.get(f"{DEVOPS_BASE}/databases/{db_id}", headers=_headers(), timeout=30)
+    r = _SESSION.get(f"{DEVOPS_BASE}/databases/{db_id}", timeout=30)
     r.raise_for_status()
     return r.json()
 
-def wait_for_active(db_id: str):
-    for _ in range(40):
+def _backoff_delays(budget_s: float, base: float = 2.0, cap: float = 15.0):
+    """Yield jittered exponential delays until the wall-clock budget is spent."""
+    deadline = time.monotonic() + budget_s
+    n = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        delay = min(cap, base * 2 ** n) * random.uniform(0.75, 1.25)
+        yield min(delay, remaining)
+        n += 1
+
+def wait_for_active(db_id: str, budget_s: float = 600):
+    for delay in _backoff_delays(budget_s):
         db = get_db(db_id)
         status = db.get("status") or (db.get("info", {}) or {}).get("status")
         print(f"⏳ DB status: {status}")
         if status == "ACTIVE":
             return db
-        time.sleep(15)
+        time.sleep(delay)
     raise RuntimeError("DB did not become ACTIVE in time")
 
-def poll_find_by_name(name: str, attempts=60, delay=5):
-    for _ in range(attempts):
-        db = find_existing_db(name)
+def poll_find_by_name(name: str, budget_s: float = 300):
+    for delay in _backoff_delays(budget_s):
+        db = find_existing_db(name, fresh=True)
         if db: return db
         time.sleep(delay)
     raise RuntimeError(f"DB '{name}' not visible after create")
@@ -78,7 +111,8 @@ def create_db(name: str):
         "region": ASTRA_REGION,
         "dbType": ASTRA_DB_TYPE,  # "vector"
     }
-    r = requests.post(f"{DEVOPS_BASE}/databases", headers=_headers(), json=payload, timeout=60)
+    r = _SESSION.post(f"{DEVOPS_BASE}/databases", json=payload, timeout=60)
+    _dbs_snapshot.cache_clear()
     if r.status_code in (200, 201, 202, 409):
         return poll_find_by_name(name)
     try:
@@ -88,7 +122,7 @@ def create_db(name: str):
 
 # ── Token via /v2/tokens (org-scoped) ─────────────────────────────────────────
 def list_roles():
-    r = requests.get(f"{DEVOPS_BASE}/organizations/roles", headers=_headers(), timeout=30)
+    r = _SESSION.get(f"{DEVOPS_BASE}/organizations/roles", timeout=30)
     r.raise_for_status()
     body = r.json()
     return body["data"] if isinstance(body, dict) and "data" in body else body
@@ -116,7 +150,7 @@ def create_app_token_for_org(role_name="Organization Administrator", description
     if ASTRA_ORG_ID:
         payload["orgId"] = ASTRA_ORG_ID
 
-    r = requests.post(f"{DEVOPS_BASE}/tokens", headers=_headers(), json=payload, timeout=60)
+    r = _SESSION.post(f"{DEVOPS_BASE}/tokens", json=payload, timeout=60)
     r.raise_for_status()
     body = r.json() if r.content else {}
     token = body.get("token")
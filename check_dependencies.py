@@ -7,7 +7,9 @@ Ensures all required models and dependencies are installed before running the pi
 import sys
 import subprocess
 import os
-import importlib
+import argparse
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import time
 
@@ -18,6 +20,21 @@ try:
 except ImportError:
     pass  # dotenv not available, continue without it
 
+def _import_name(package):
+    """Map a pip package name to its importable module name."""
+    if package == 'python-dotenv':
+        return 'dotenv'
+    if package == 'beautifulsoup4':
+        return 'bs4'
+    return package.replace('-', '_')
+
+def _is_installed(package):
+    # find_spec only locates the package; it doesn't run its (heavy) init code
+    try:
+        return importlib.util.find_spec(_import_name(package)) is not None
+    except (ImportError, ValueError):
+        return False
+
 def check_python_packages():
     """Check if all required Python packages are installed."""
     required_packages = [
@@ -39,18 +56,12 @@ def check_python_packages():
     missing_packages = []
     
     print("🔍 Checking Python packages...")
-    for package in required_packages:
-        try:
-            # Handle package name variations
-            import_name = package.replace('-', '_')
-            if package == 'python-dotenv':
-                import_name = 'dotenv'
-            elif package == 'beautifulsoup4':
-                import_name = 'bs4'
-            
-            importlib.import_module(import_name)
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        results = list(ex.map(lambda p: (p, _is_installed(p)), required_packages))
+    for package, installed in results:
+        if installed:
             print(f"  ✅ {package}")
-        except ImportError:
+        else:
             print(f"  ❌ {package} - MISSING")
             missing_packages.append(package)
     
@@ -203,8 +214,8 @@ def check_astra_connection():
         print(f"  ❌ Astra DB connection failed: {e}")
         return False
 
-def main():
-    """Main dependency check function."""
+def check(preload: bool = False) -> bool:
+    """Run all checks (importable, e.g. from quick_start.py); True if everything passed."""
     print("🚀 Web Chatbot Pipeline - Dependency Checker")
     print("=" * 50)
     
@@ -224,13 +235,14 @@ def main():
     if not check_environment_variables():
         all_checks_passed = False
     
-    # Pre-load models (only if other checks pass)
+    # Pre-load models (only if requested and other checks pass)
     if all_checks_passed:
-        if not preload_sentence_transformer():
-            all_checks_passed = False
-        
-        if not preload_cross_encoder():
-            all_checks_passed = False
+        if preload:
+            if not preload_sentence_transformer():
+                all_checks_passed = False
+            
+            if not preload_cross_encoder():
+                all_checks_passed = False
         
         # Test Astra connection
         if not check_astra_connection():
@@ -246,6 +258,16 @@ def main():
         print("  # Terminal 2: cd frontend && npm run dev")
     else:
         print("❌ Some dependencies are missing. Please fix the issues above.")
+    return all_checks_passed
+
+def main():
+    """Main dependency check function."""
+    parser = argparse.ArgumentParser(description="Check pipeline dependencies.")
+    parser.add_argument("--preload", action="store_true",
+                        help="also download/load the embedding and cross-encoder models")
+    args = parser.parse_args()
+
+    if not check(preload=args.preload):
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -3,7 +3,8 @@ import os
 import sys
 from urllib.parse import urldefrag
 from dotenv import load_dotenv, find_dotenv
-from astrapy import DataAPIClient
+from astra_client import get_collection
+from query_cache import cached_find
 
 # ── Env ─────────────────────────────────────────────────────────────
 load_dotenv(find_dotenv(usecwd=True), override=True)
@@ -28,16 +29,23 @@ print(f"Using endpoint: {ENDPOINT[:38]}...  token: {TOKEN[:12]}…  coll: {COLL}
 print(f"Target URL: {URL}")
 
 # ── Connect ─────────────────────────────────────────────────────────
-cl = DataAPIClient(TOKEN).get_database_by_api_endpoint(ENDPOINT).get_collection(COLL)
+cl = get_collection(COLL)
 
 # ── Fetch helpers ───────────────────────────────────────────────────
 def try_exact(u: str):
-    return list(cl.find({"site_name": SITE, "url": u}, limit=500))
+    return list(cl.find({"site_name": SITE, "url": u},
+                        projection={"url": 1, "chunk_index": 1, "text": 1}, limit=500))
 
 def scan_site():
     # Pull a bounded pool for the site and filter locally by URL prefix/anchor.
-    # Increase limit if your site has >5000 chunks.
-    return list(cl.find({"site_name": SITE}, limit=5000))
+    # Increase limit if your site has >5000 chunks. Only the fields we print are
+    # projected, and the result is cached briefly across repeated debug runs.
+    return cached_find(
+        cl, {"site_name": SITE},
+        key_parts=(ENDPOINT, COLL),
+        projection={"url": 1, "chunk_index": 1, "text": 1},
+        limit=5000,
+    )
 
 # ── Retrieval strategy (no $regex / $startswith) ────────────────────
 docs = try_exact(URL)
@@ -1,19 +1,25 @@
 import os
 from dotenv import load_dotenv
-from astrapy import DataAPIClient
+from astra_client import get_collection
 
 load_dotenv()
-cl = DataAPIClient(os.getenv("ASTRA_DB_APPLICATION_TOKEN"))\
-     .get_database_by_api_endpoint(os.getenv("ASTRA_DB_API_ENDPOINT"))\
-     .get_collection(os.getenv("ASTRA_COLLECTION_NAME","chatbot_chunks"))
+cl = get_collection()
 
 SITE = os.getenv("SITE_NAME","incede-dev.netlify.app")
 needle = "services/planning-budgeting-and-analytics"
+MAX_SCAN = int(os.getenv("CHECK_URL_MAX_SCAN", "3000"))       # docs to look at, at most
+MAX_MATCHES = int(os.getenv("CHECK_URL_MAX_MATCHES", "200"))  # stop once this many URLs match
 
+# Astra has no $regex/substring filter, so match client-side. The cursor pages
+# results from the server lazily, so we only pull as many pages as we consume.
 seen=set()
-for d in cl.find({"site_name": SITE}, limit=3000, projection={"url":1}):
+scanned = 0
+for d in cl.find({"site_name": SITE}, limit=MAX_SCAN, projection={"url":1}):
+    scanned += 1
     u = (d.get("url") or "")
     if needle in u and u not in seen:
         seen.add(u); print(u)
+        if len(seen) >= MAX_MATCHES:
+            break
 
-print("\nTotal matches:", len(seen))
\ No newline at end of file
+print(f"\nTotal matches: {len(seen)} (scanned {scanned} docs)")
@@ -1,11 +1,9 @@
 import os
 from dotenv import load_dotenv
-from astrapy import DataAPIClient
+from astra_client import get_collection
 
 load_dotenv()
-cl = DataAPIClient(os.getenv("ASTRA_DB_APPLICATION_TOKEN"))\
-     .get_database_by_api_endpoint(os.getenv("ASTRA_DB_API_ENDPOINT"))\
-     .get_collection(os.getenv("ASTRA_COLLECTION_NAME","chatbot_chunks"))
+cl = get_collection()
 
 SITE = os.getenv("SITE_NAME","incede-dev.netlify.app")
 doc = cl.find_one({"site_name": SITE}, projection={"$vector":1})
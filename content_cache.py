@@ -0,0 +1,95 @@
+# content_cache.py
+import hashlib, json, os, sqlite3, threading
+import numpy as np
+
+# Content-addressed cache shared across pipeline runs: page parses keyed by the
+# fetched HTML, chunk embeddings keyed by model + chunk text. Re-running an
+# unchanged site then skips re-parsing and re-embedding.
+# Set CONTENT_CACHE=0 (or pass --no-cache to run_all.py) to bypass it.
+CONTENT_CACHE_ENABLED = os.getenv("CONTENT_CACHE", "1") != "0"
+CONTENT_CACHE_PATH = os.getenv("CONTENT_CACHE_PATH", ".content_cache.sqlite")
+
+_conn = None
+_lock = threading.Lock()
+
+def _db():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(CONTENT_CACHE_PATH, check_same_thread=False)
+        _conn.execute("CREATE TABLE IF NOT EXISTS parsed (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # vectors are stored as float16: half the disk of float32, and well
+        # inside the noise of a cosine ranking. One-time migration: drop the
+        # old float32 table if this cache file still has it
+        if _conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'embeddings'").fetchone():
+            _conn.execute("DROP TABLE embeddings")
+        _conn.execute("CREATE TABLE IF NOT EXISTS embeddings_f16 (key TEXT PRIMARY KEY, vec BLOB NOT NULL)")
+        _conn.commit()
+    return _conn
+
+def content_hash(*parts: str | bytes) -> str:
+    """blake2b-128 hex digest of the parts (NUL-separated; str is hashed as UTF-8)."""
+    h = hashlib.blake2b(digest_size=16)
+    for i, p in enumerate(parts):
+        if i:
+            h.update(b"\0")
+        h.update(p if isinstance(p, bytes) else p.encode("utf-8"))
+    return h.hexdigest()
+
+# ── Page parses ────────────────────────────────────────────────────
+def get_parsed(key: str):
+    if not CONTENT_CACHE_ENABLED:
+        return None
+    with _lock:
+        row = _db().execute("SELECT value FROM parsed WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def put_parsed(key: str, value) -> None:
+    if not CONTENT_CACHE_ENABLED:
+        return
+    with _lock:
+        db = _db()
+        db.execute("INSERT OR REPLACE INTO parsed (key, value) VALUES (?, ?)",
+                   (key, json.dumps(value, ensure_ascii=False)))
+        db.commit()
+
+# ── Embeddings ─────────────────────────────────────────────────────
+_SQL_VARS = 500  # keys per SELECT ... IN (...); under SQLite's bound-parameter limit
+
+def encode_cached(model, model_name: str, texts: list[str], **encode_kwargs) -> np.ndarray:
+    """model.encode(texts) as a float32 matrix, encoding only the cache misses.
+
+    Values are always rounded through float16 (the store's precision), so a
+    hit, a fresh encode and a CONTENT_CACHE=0 run give the same vector.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    if not CONTENT_CACHE_ENABLED:
+        vecs = model.encode(texts, convert_to_numpy=True, **encode_kwargs)
+        return np.asarray(vecs, dtype=np.float16).astype(np.float32)
+
+    keys = [content_hash(model_name, t) for t in texts]
+    uniq = list(dict.fromkeys(keys))
+    found = {}
+    with _lock:
+        db = _db()
+        for i in range(0, len(uniq), _SQL_VARS):
+            part = uniq[i:i + _SQL_VARS]
+            rows = db.execute(
+                f"SELECT key, vec FROM embeddings_f16 WHERE key IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            for k, blob in rows:
+                found[k] = np.frombuffer(blob, dtype=np.float16)
+
+    miss_text = {k: t for k, t in zip(keys, texts) if k not in found}  # dedupes repeats too
+    misses = list(miss_text)
+    if misses:
+        vecs = model.encode([miss_text[k] for k in misses], convert_to_numpy=True, **encode_kwargs)
+        vecs = np.asarray(vecs, dtype=np.float16)
+        with _lock:
+            db = _db()
+            db.executemany("INSERT OR REPLACE INTO embeddings_f16 (key, vec) VALUES (?, ?)",
+                           [(k, v.tobytes()) for k, v in zip(misses, vecs)])
+            db.commit()
+        found.update(zip(misses, vecs))
+
+    return np.stack([found[k] for k in keys]).astype(np.float32)
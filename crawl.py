@@ -1,30 +1,43 @@
 # crawl.py
 import os
 import asyncio, hashlib, json, re, sys, time, urllib.parse
-from pathlib import Path
 from collections import deque
+from pathlib import Path
 from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
 from dotenv import load_dotenv
+import content_cache
+from parsed_io import dump_json
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
 
 load_dotenv()
 
+def dump_json_line(obj) -> bytes:
+    """Compact single-line UTF-8 JSON terminated by a newline (NDJSON record)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8") + b"\n"
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Run ID & folders
 # ──────────────────────────────────────────────────────────────────────────────
-def get_run_id_from_args():
-    if len(sys.argv) >= 5:
-        return sys.argv[4]  # run_id passed from run_all.py or chatbot backend
-    return time.strftime("%Y%m%d_%H%M%S")  # default: generate new
+# Set by set_run() (via main) before crawling
+RUN_ID = BASE_DIR = RAW = PARSED = MASTER = None
 
-RUN_ID = get_run_id_from_args()
-BASE_DIR = Path("data") / RUN_ID
-RAW = BASE_DIR / "raw"
-PARSED = BASE_DIR / "parsed"
-MASTER = BASE_DIR / "master.json"
+def set_run(run_id: str | None = None):
+    global RUN_ID, BASE_DIR, RAW, PARSED, MASTER
+    RUN_ID = run_id or time.strftime("%Y%m%d_%H%M%S")  # default: generate new
+    BASE_DIR = Path("data") / RUN_ID
+    RAW = BASE_DIR / "raw"
+    PARSED = BASE_DIR / "parsed"
+    MASTER = BASE_DIR / "master.ndjson"  # one item per line, appended as pages are saved
 
-RAW.mkdir(parents=True, exist_ok=True)
-PARSED.mkdir(parents=True, exist_ok=True)
+    RAW.mkdir(parents=True, exist_ok=True)
+    PARSED.mkdir(parents=True, exist_ok=True)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Manual URLs from .env (comma-separated) — ALWAYS fetched & saved
@@ -37,7 +50,10 @@ def env_manual_urls():
         return []
     return [p.strip() for p in raw.split(",") if p.strip()]
 
-MANUAL_URLS = env_manual_urls()
+MANUAL_URLS = tuple(dict.fromkeys(env_manual_urls()))  # de-duplicated, order kept
+
+# Number of pages fetched in parallel (one Playwright page per worker)
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "8"))
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Case-study rules (special case) — kept exactly as your original
@@ -80,15 +96,19 @@ SKIP_EXT = {
     ".mp4", ".mp3", ".wav", ".zip", ".rar", ".7z", ".gz", ".css", ".js",
     ".json", ".xml", ".txt", ".ppt", ".pptx", ".doc", ".docx", ".xls", ".xlsx"
 }
+_SKIP = frozenset(SKIP_EXT)
+
+_SCHEME = re.compile(r"^https?://")
 
 def slug(url: str) -> str:
-    host = re.sub(r"^https?://", "", url).split("/")[0]
+    host = _SCHEME.sub("", url, count=1).split("/", 1)[0]
     return f"{host}_{hashlib.md5(url.encode()).hexdigest()[:10]}"
 
 def same_host(a: str, b: str) -> bool:
     return urllib.parse.urlparse(a).netloc == urllib.parse.urlparse(b).netloc
 
-def norm_link(href: str, base: str):
+def norm_link(href: str, base: str, host: str | None = None):
+    """Absolute crawlable URL for href, or None. If host is given, other hosts are rejected."""
     if not href:
         return None
     href = href.strip()
@@ -98,10 +118,19 @@ def norm_link(href: str, base: str):
     u = urllib.parse.urlparse(absu)
     if u.scheme not in ("http", "https"):
         return None
-    if any(u.path.lower().endswith(ext) for ext in SKIP_EXT):
+    if host is not None and u.netloc != host:
+        return None
+    ext = u.path.rpartition(".")[2].lower()
+    if ext and "." + ext in _SKIP:
         return None
     return urllib.parse.urlunparse(u)
 
+def _visible_text(node) -> str:
+    """Whitespace-normalized text of a soup node, built in a single pass."""
+    # split() drops each string's edges and collapses the runs inside it, so
+    # joining its words gives the normalized text with no second pass
+    return " ".join(w for s in node.stripped_strings for w in s.split())
+
 def _section_text_by_fragment(soup: BeautifulSoup, frag: str) -> str | None:
     """Return text of the section that corresponds to the given fragment id."""
     if not frag:
@@ -115,11 +144,11 @@ def _section_text_by_fragment(soup: BeautifulSoup, frag: str) -> str | None:
         container = container.parent
     section = container or node
     # Prefer stopping at the next sibling section-like block if huge
-    text = " ".join(section.get_text(" ").split())
-    return text.strip() or None
+    text = _visible_text(section)
+    return text or None
 
 def parse(html: str, base_url: str):
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(html, "lxml")
     for t in soup(["script", "style", "noscript"]):
         t.decompose()
 
@@ -139,20 +168,47 @@ def parse(html: str, base_url: str):
             text = section_text
         else:
             # fallback to full page if id not found
-            text = " ".join(soup.get_text(" ").split())
+            text = _visible_text(soup)
     else:
-        text = " ".join(soup.get_text(" ").split())
+        text = _visible_text(soup)
 
-    # Links (resolve against base page URL, not fragment)
+    # Links (resolve against base page URL, not fragment); same-host only, so
+    # off-site URLs never reach the crawl queue
     links = []
+    host = urllib.parse.urlparse(base_for_links).netloc
     for a in soup.find_all("a", href=True):
-        n = norm_link(a["href"], base_for_links)
+        n = norm_link(a["href"], base_for_links, host)
         if n:
             links.append(n)
     return title, text, links
 
+def parse_cached(html: str, url: str):
+    """parse() memoised on (url, html); unchanged pages skip BeautifulSoup on re-runs."""
+    key = content_cache.content_hash(url, html)
+    hit = content_cache.get_parsed(key)
+    if hit is not None:
+        return hit["title"], hit["text"], hit["links"]
+    title, text, links = parse(html, url)
+    content_cache.put_parsed(key, {"title": title, "text": text, "links": links})
+    return title, text, links
+
+# Resource types the crawler never needs (text + links only)
+BLOCKED_RESOURCES = frozenset({"image", "media", "font"})
+
+async def block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
 async def fetch(page, url: str) -> str:
-    await page.goto(url, wait_until="networkidle", timeout=60000)
+    # BFS only needs the rendered DOM + <a href>; networkidle rarely fires on busy sites
+    await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+    try:
+        # give client-side rendering a short window; the DOM we have is usable regardless
+        await page.wait_for_load_state("load", timeout=10000)
+    except PlaywrightTimeout:
+        pass
     return await page.content()
 
 def save_item(url: str, html: str, title: str, text: str, links: list[str]):
@@ -163,83 +219,158 @@ def save_item(url: str, html: str, title: str, text: str, links: list[str]):
         "url": url,
         "title": title,
         "timestamp": int(time.time()),
+        "content_hash": content_cache.content_hash(html),
         "text": text,
         "links": links,  # stored links are the filtered, crawlable ones
     }
-    (PARSED / f"{name}.json").write_text(json.dumps(item, ensure_ascii=False, indent=2), encoding="utf-8")
+    (PARSED / f"{name}.json").write_bytes(dump_json(item, indent=True))
     return item
 
-def rebuild_master():
-    items = []
-    for p in PARSED.glob("*.json"):
-        try:
-            items.append(json.loads(p.read_text(encoding="utf-8")))
-        except:
-            pass
-    MASTER.write_text(json.dumps({"count": len(items), "items": items}, ensure_ascii=False, indent=2), encoding="utf-8")
+def append_master(master, item: dict):
+    """Append one saved item to master.ndjson; a later line for the same id supersedes earlier ones."""
+    master.write(dump_json_line(item))
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Force-fetch manual URLs (ignores max_pages and dedup)
 # ──────────────────────────────────────────────────────────────────────────────
-async def fetch_and_save_manual(start_url: str, page) -> int:
+async def fetch_and_save_manual(start_url: str, page, master, saved: set, on_saved=None) -> int:
     count = 0
     for url in MANUAL_URLS:
-        if not same_host(start_url, url):
+        if not same_host(start_url, url) or slug(url) in saved:
             continue
         try:
             html = await fetch(page, url)
-            title, text, _ = parse(html, url)  # anchor-scoped if hash present
+            title, text, _ = parse_cached(html, url)  # anchor-scoped if hash present
             # Save without queued links to avoid SPA explosion
-            save_item(url, html, title, text, links=[])
+            item = save_item(url, html, title, text, links=[])
+            saved.add(item["id"])
+            append_master(master, item)
+            if on_saved:
+                on_saved(PARSED / f"{item['id']}.json")
             count += 1
             print(f"[manual] saved {url}")
         except Exception as e:
             print(f"[manual ERR] {url}: {e}")
     return count
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Browser context (persistent profile → HTTP cache/cookies survive reruns)
+# Kept outside data/ so it is never mistaken for a run folder.
+# ──────────────────────────────────────────────────────────────────────────────
+BROWSER_PROFILE_DIR = Path(os.getenv("CRAWL_BROWSER_PROFILE", ".pwcache"))
+
+async def open_context(p):
+    """Return (ctx, browser); browser is None when the persistent profile is used."""
+    try:
+        ctx = await p.chromium.launch_persistent_context(
+            user_data_dir=str(BROWSER_PROFILE_DIR), headless=True
+        )
+        return ctx, None
+    except Exception as e:
+        # e.g. profile locked by a concurrent crawl → fall back to a throwaway context
+        print(f"[warn] persistent browser profile unavailable ({e}); using a fresh context")
+        browser = await p.chromium.launch(headless=True)
+        return await browser.new_context(), browser
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Crawler (BFS)
 # ──────────────────────────────────────────────────────────────────────────────
-async def crawl(start_url: str, max_depth: int, max_pages: int):
-    seen = set()
-    q = deque([(start_url, 0)])
+async def crawl(start_url: str, max_depth: int, max_pages: int, on_saved=None):
+    """BFS crawl. on_saved(path), if given, is called with each parsed JSON file
+    as soon as it is written, so later stages can start before the crawl ends."""
+    # seen = URLs (fragment stripped) already queued; checked once at enqueue time
+    seen = {start_url.partition("#")[0]}
+    q: asyncio.Queue = asyncio.Queue()
+    q.put_nowait((start_url, 0))
     crawled = 0
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        ctx = await browser.new_context()
-        page = await ctx.new_page()
+    claimed = 0  # pages being fetched or already saved; keeps workers within max_pages
+    # URLs dequeued while the budget was fully claimed. A failed fetch releases
+    # its slot and sends the oldest one back to the queue; whatever is left
+    # once the queue drains was genuinely over budget.
+    deferred: deque = deque()
+    # slugs written this run: a file handed to on_saved may be mid-annotation by
+    # a pipeline worker, so it is never rewritten (e.g. start_url also listed
+    # in CRAWL_MANUAL_URLS)
+    saved: set[str] = set()
+
+    async def worker(page):
+        nonlocal crawled, claimed
         try:
-            # 1) Always fetch manual URLs first (don’t count toward max_pages)
-            await fetch_and_save_manual(start_url, page)
-
-            # 2) Then normal crawl within limits
-            while q and crawled < max_pages:
-                url, d = q.popleft()
-                key = url.split("#", 1)[0]
-                if key in seen or not same_host(start_url, url):
-                    continue
-                seen.add(key)
+            while True:
+                url, d = await q.get()
                 try:
-                    html = await fetch(page, url)
-                    title, text, links = parse(html, url)
-                    links = filter_links(url, links)
-                    save_item(url, html, title, text, links)
-                    crawled += 1
-                    print(f"[{crawled}/{max_pages}] {url} (depth={d}, links={len(links)})")
-                    if d < max_depth:
-                        for ln in links:
-                            k = ln.split("#", 1)[0]
-                            if k not in seen:
-                                q.append((ln, d + 1))
-                except Exception as e:
-                    print(f"[ERR] {url}: {e}")
+                    # links are already same-host (see parse), so no host check here
+                    if claimed >= max_pages:
+                        deferred.append((url, d))
+                        continue
+                    claimed += 1
+                    try:
+                        html = await fetch(page, url)
+                        title, text, links = parse_cached(html, url)
+                        links = filter_links(url, links)
+                        if slug(url) not in saved:
+                            item = save_item(url, html, title, text, links)
+                            saved.add(item["id"])
+                            append_master(master, item)
+                            if on_saved:
+                                on_saved(PARSED / f"{item['id']}.json")
+                        crawled += 1
+                        print(f"[{crawled}/{max_pages}] {url} (depth={d}, links={len(links)})")
+                        if d < max_depth:
+                            # no await between check and add, so `seen` needs no lock
+                            for ln in links:
+                                k = ln.partition("#")[0]
+                                if k not in seen:
+                                    seen.add(k)
+                                    q.put_nowait((ln, d + 1))
+                    except Exception as e:
+                        claimed -= 1  # failed pages don't count toward max_pages
+                        print(f"[ERR] {url}: {e}")
+                        if deferred:
+                            # queued before this task_done(), so q.join() waits for it
+                            q.put_nowait(deferred.popleft())
+                finally:
+                    q.task_done()
         finally:
-            await ctx.close()
-            await browser.close()
+            await page.close()
+
+    with MASTER.open("ab") as master:
+        async with async_playwright() as p:
+            ctx, browser = await open_context(p)
+            try:
+                await ctx.route("**/*", block_heavy_resources)
+
+                # 1) Always fetch manual URLs first (don’t count toward max_pages)
+                page = await ctx.new_page()
+                try:
+                    await fetch_and_save_manual(start_url, page, master, saved, on_saved)
+                finally:
+                    await page.close()
+
+                # 2) Then normal crawl within limits, CRAWL_CONCURRENCY pages in flight.
+                # Never open more tabs than can be used: a depth-0 crawl (e.g. the
+                # case-studies index) only ever visits start_url.
+                n_pages = 1 if max_depth == 0 else min(CRAWL_CONCURRENCY, max_pages)
+                pages = [await ctx.new_page() for _ in range(max(1, n_pages))]
+                workers = [asyncio.create_task(worker(pg)) for pg in pages]
+                try:
+                    await q.join()
+                finally:
+                    for w in workers:
+                        w.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+            finally:
+                await ctx.close()
+                if browser:
+                    await browser.close()
 
-    rebuild_master()
     print(f"Done. Crawled {crawled} pages. Manual saved: {len(MANUAL_URLS)}")
 
+def main(start_url: str, max_depth: int, max_pages: int, run_id: str | None = None, on_saved=None):
+    """Crawl into data/<run_id>/ (run_id passed from run_all.py or chatbot backend)."""
+    set_run(run_id)
+    asyncio.run(crawl(start_url, int(max_depth), int(max_pages), on_saved))
+
 # ──────────────────────────────────────────────────────────────────────────────
 # CLI
 # ──────────────────────────────────────────────────────────────────────────────
@@ -247,4 +378,4 @@ if __name__ == "__main__":
     if len(sys.argv) < 4:
         print("Usage: python crawl.py <START_URL> <MAX_DEPTH:int> <MAX_PAGES:int> [RUN_ID]")
         sys.exit(1)
-    asyncio.run(crawl(sys.argv[1], int(sys.argv[2]), int(sys.argv[3])))
\ No newline at end of file
+    main(sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4] if len(sys.argv) >= 5 else None)
\ No newline at end of file
@@ -1,37 +1,44 @@
 # create_astra_collection.py
 import os
 from dotenv import load_dotenv
-from astrapy import DataAPIClient
+from astra_client import get_database
 
 load_dotenv()
 
-ASTRA_DB_API_ENDPOINT = os.getenv("ASTRA_DB_API_ENDPOINT")
-ASTRA_DB_APPLICATION_TOKEN = os.getenv("ASTRA_DB_APPLICATION_TOKEN")
 COLLECTION_NAME = os.getenv("ASTRA_COLLECTION_NAME", "chatbot_chunks")
+ASTRA_HYBRID = os.getenv("ASTRA_HYBRID", "0") == "1"
 
-client = DataAPIClient(ASTRA_DB_APPLICATION_TOKEN)
-db = client.get_database_by_api_endpoint(ASTRA_DB_API_ENDPOINT)
+def main():
+    db = get_database()
 
-print("✅ Connected to Astra DB")
+    print("✅ Connected to Astra DB")
 
-# list_collections may return objects or dicts
-existing = []
-for c in db.list_collections():
-    if hasattr(c, "name"):
-        existing.append(c.name)
-    elif isinstance(c, dict) and "name" in c:
-        existing.append(c["name"])
+    # list_collections may return objects or dicts
+    existing = []
+    for c in db.list_collections():
+        if hasattr(c, "name"):
+            existing.append(c.name)
+        elif isinstance(c, dict) and "name" in c:
+            existing.append(c["name"])
 
-if COLLECTION_NAME not in existing:
-    db.create_collection(
-        COLLECTION_NAME,
-        definition={
+    if COLLECTION_NAME not in existing:
+        definition = {
             "vector": {
                 "dimension": 768,   # all-mpnet-base-v2
                 "metric": "cosine"
             }
         }
-    )
-    print(f"📦 Created vector collection: {COLLECTION_NAME}")
-else:
-    print(f"ℹ️ Collection already exists: {COLLECTION_NAME}")
\ No newline at end of file
+        if ASTRA_HYBRID:
+            # BM25 index + server-side reranker for findAndRerank ($hybrid) queries
+            definition["lexical"] = {"enabled": True, "analyzer": "standard"}
+            definition["rerank"] = {
+                "enabled": True,
+                "service": {"provider": "nvidia", "modelName": "nvidia/llama-3.2-nv-rerankqa-1b-v2"},
+            }
+        db.create_collection(COLLECTION_NAME, definition=definition)
+        print(f"📦 Created vector collection: {COLLECTION_NAME}")
+    else:
+        print(f"ℹ️ Collection already exists: {COLLECTION_NAME}")
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,11 @@ import json
 import glob
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from dotenv import load_dotenv
-import requests
+from parsed_io import read_json, write_json, needs_processing
+from watsonx_utils import SESSION, cached_chat, get_watsonx_token, extract_first_json_object
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Env & Config
@@ -15,27 +17,20 @@ load_dotenv()
 WATSONX_PROJECT_ID = os.getenv("WATSONX_PROJECT_ID")
 WATSONX_URL = os.getenv("WATSONX_URL")  # e.g., https://ca-tor.ml.cloud.ibm.com
 MODEL_ID = os.getenv("WATSONX_MODEL_ID", "meta-llama/llama-3-3-70b-instruct")
+# Parallel Watsonx calls (I/O-bound); capped by default at the HTTP pool size
+MAX_PARALLEL_REQUESTS = int(os.getenv("MAX_PARALLEL_REQUESTS", min(32, (os.cpu_count() or 1) * 5)))
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Handle run_id
 # ──────────────────────────────────────────────────────────────────────────────
 def get_latest_run_folder():
-    data_dir = Path("data")
-    runs = [d for d in data_dir.iterdir() if d.is_dir()]
-    if not runs:
+    # scandir's DirEntry.is_dir() usually needs no extra stat; max() needs no sort
+    with os.scandir("data") as it:
+        latest = max((e.name for e in it if e.is_dir(follow_symlinks=False)), default=None)
+    if latest is None:
         raise RuntimeError("No run folders found in data/")
-    return str(sorted(runs)[-1].name)
+    return latest
 
-if len(sys.argv) > 1:
-    RUN_ID = sys.argv[1]
-else:
-    RUN_ID = get_latest_run_folder()
-
-BASE_DIR = Path("data") / RUN_ID
-PARSED = BASE_DIR / "parsed"
-
-if not PARSED.exists():
-    raise RuntimeError(f"Parsed folder not found: {PARSED}")
 
 # ──────────────────────────────────────────────────────────────────────────────
 STRATEGIES = [
@@ -60,28 +55,35 @@ Respond in JSON exactly as:
 {{"chunking_strategy": "...", "reasoning": "..."}}
 """
 
-# ──────────────────────────────────────────────────────────────────────────────
-def get_watsonx_token():
-    apikey = os.getenv("IBM_API_KEY")
-    if not apikey:
-        raise RuntimeError("Missing IBM_API_KEY")
-    resp = requests.post(
-        "https://iam.cloud.ibm.com/identity/token",
-        data={
-            "grant_type": "urn:ibm:params:oauth:grant-type:apikey",
-            "apikey": apikey,
-        },
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-        timeout=30,
-    )
-    resp.raise_for_status()
-    return resp.json()["access_token"]
+# Constant parts of the prompt, split out once; STRATEGIES is baked into the
+# tail (whose .format also un-escapes the {{ }} braces)
+_PROMPT_HEAD, _rest = PROMPT_TEMPLATE.split("{page_type}")
+_PROMPT_MID, _PROMPT_TAIL = _rest.split("{text}")
+_PROMPT_TAIL = _PROMPT_TAIL.format(strategies="\n".join(STRATEGIES))
+del _rest
 
+# ──────────────────────────────────────────────────────────────────────────────
 def watsonx_chat_call(prompt_text: str, *, temperature: float = 0, max_tokens: int = 500) -> dict:
     if not WATSONX_URL or not WATSONX_PROJECT_ID:
         raise RuntimeError("Missing WATSONX_URL or WATSONX_PROJECT_ID")
 
+    messages = [
+        {
+            "role": "system",
+            "content": "Return only one JSON object with keys chunking_strategy and reasoning; nothing else.",
+        },
+        {
+            "role": "user",
+            "content": [{"type": "text", "text": prompt_text}],
+        },
+    ]
+
+    return cached_chat(MODEL_ID, messages, max_tokens, lambda: _chat(messages, temperature, max_tokens),
+                       temperature=temperature)
+
+def _chat(messages, temperature: float, max_tokens: int) -> dict:
     token = get_watsonx_token()
+
     url = f"{WATSONX_URL}/ml/v1/text/chat?version=2023-05-29"
     headers = {
         "Authorization": f"Bearer {token}",
@@ -91,20 +93,12 @@ def watsonx_chat_call(prompt_text: str, *, temperature: float = 0, max_tokens: i
     body = {
         "project_id": WATSONX_PROJECT_ID,
         "model_id": MODEL_ID,
-        "messages": [
-            {
-                "role": "system",
-                "content": "Return only one JSON object with keys chunking_strategy and reasoning; nothing else.",
-            },
-            {
-                "role": "user",
-                "content": [{"type": "text", "text": prompt_text}],
-            },
-        ],
+        "messages": messages,
         "temperature": temperature,
         "max_tokens": max_tokens,
     }
-    resp = requests.post(url, headers=headers, json=body, timeout=60)
+
+    resp = SESSION.post(url, headers=headers, json=body, timeout=60)
     resp.raise_for_status()
     result = resp.json()
 
@@ -121,29 +115,8 @@ def watsonx_chat_call(prompt_text: str, *, temperature: float = 0, max_tokens: i
 
     return {"raw": result, "text": content}
 
-def _extract_first_json_object(s: str):
-    if not s:
-        return None
-    start = s.find("{")
-    if start == -1:
-        return None
-    depth = 0
-    for i in range(start, len(s)):
-        ch = s[i]
-        if ch == "{":
-            depth += 1
-        elif ch == "}":
-            depth -= 1
-            if depth == 0:
-                return s[start: i + 1]
-    return None
-
 def detect_strategy(page_type: str, text: str):
-    prompt = PROMPT_TEMPLATE.format(
-        page_type=page_type or "Unknown",
-        text=(text or "")[:4000],
-        strategies="\n".join(STRATEGIES),
-    )
+    prompt = f"{_PROMPT_HEAD}{page_type or 'Unknown'}{_PROMPT_MID}{(text or '')[:4000]}{_PROMPT_TAIL}"
     out = watsonx_chat_call(prompt, temperature=0, max_tokens=500)
     content = out["text"]
 
@@ -173,38 +146,51 @@ def detect_strategy(page_type: str, text: str):
                 return {"chunking_strategy": "Unknown", "reasoning": f"JSON parse error: {e}"}
 
     # Fallback: first JSON object
-    cand = _extract_first_json_object(content)
-    if cand:
-        try:
-            parsed = json.loads(cand)
-            return {
-                "chunking_strategy": parsed.get("chunking_strategy", "Unknown"),
-                "reasoning": parsed.get("reasoning", "")
-            }
-        except Exception as e:
-            return {"chunking_strategy": "Unknown", "reasoning": f"JSON parse error: {e}"}
+    parsed = extract_first_json_object(content)
+    if isinstance(parsed, dict):
+        return {
+            "chunking_strategy": parsed.get("chunking_strategy", "Unknown"),
+            "reasoning": parsed.get("reasoning", "")
+        }
 
     return {"chunking_strategy": "Unknown", "reasoning": "No valid JSON found in model output."}
 
-def main():
-    files = glob.glob(str(PARSED / "*.json"))
+def process_file(p: Path):
+    if not needs_processing(p, "chunking_strategy", "reasoning"):
+        return
+    try:
+        data = read_json(p)
+    except Exception as e:
+        print(f"[SKIP] {p.name}: invalid JSON ({e})")
+        return
+    if "chunking_strategy" in data and "reasoning" in data:
+        return
+    url = data.get("url", p.name)
+    info = detect_strategy(data.get("page_type", "Unknown"), data.get("text", ""))
+    # single print so lines from concurrent files don't interleave
+    print(f"Processing: {url}\n  Strategy: {info['chunking_strategy']}\n  Reason: {info['reasoning']}\n")
+    data.update(info)
+    write_json(p, data)
+
+def main(run_id: str | None = None):
+    run_id = run_id or get_latest_run_folder()
+    parsed = Path("data") / run_id / "parsed"
+    if not parsed.exists():
+        raise RuntimeError(f"Parsed folder not found: {parsed}")
+
+    files = sorted(glob.glob(str(parsed / "*.json")))
     if not files:
-        print(f"No JSON files found in {PARSED.resolve()}")
+        print(f"No JSON files found in {parsed.resolve()}")
         return
 
-    for f in files:
-        p = Path(f)
-        data = json.loads(p.read_text(encoding="utf-8"))
-        if "chunking_strategy" in data and "reasoning" in data:
-            continue
-        print(f"Processing: {data.get('url', p.name)}")
-        info = detect_strategy(data.get("page_type", "Unknown"), data.get("text", ""))
-        print(f"  Strategy: {info['chunking_strategy']}")
-        print(f"  Reason: {info['reasoning']}\n")
-        data.update(info)
-        p.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    # Each file is one blocking Watsonx round-trip; overlap up to MAX_PARALLEL_REQUESTS
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as ex:
+        futures = {ex.submit(process_file, Path(f)): Path(f) for f in files}
+        for i, fut in enumerate(as_completed(futures), 1):
+            fut.result()  # re-raise: a failed call still fails the stage
+            print(f"[{i}/{len(files)}] done: {futures[fut].name}")
 
-    print(f"✅ detect_chunking_strategy completed for run {RUN_ID}")
+    print(f"✅ detect_chunking_strategy completed for run {run_id}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
\ No newline at end of file
@@ -0,0 +1,41 @@
+# llm_cache.py
+import hashlib, json, os, sqlite3, threading
+
+# Persistent cache for deterministic (temperature=0) Watsonx chat calls, so
+# re-running the pipeline over the same parsed pages doesn't re-pay every call.
+# Set LLM_CACHE=0 to disable.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite")
+
+_conn = None
+_lock = threading.Lock()
+
+def _db():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(LLM_CACHE_PATH, check_same_thread=False)
+        _conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        _conn.commit()
+    return _conn
+
+def make_key(model_id: str, messages, max_tokens: int) -> str:
+    payload = json.dumps({"model": model_id, "messages": messages, "max_tokens": max_tokens},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get(key: str):
+    """Cached value for key, or None on miss / when disabled."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _lock:
+        row = _db().execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def put(key: str, value) -> None:
+    if not LLM_CACHE_ENABLED:
+        return
+    with _lock:
+        db = _db()
+        db.execute("INSERT OR REPLACE INTO llm_cache (key, value) VALUES (?, ?)",
+                   (key, json.dumps(value, ensure_ascii=False)))
+        db.commit()
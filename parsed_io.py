@@ -0,0 +1,45 @@
+# parsed_io.py
+import json, os
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
+
+# Reading and writing data/<run_id>/parsed/*.json. crawl.py writes each page;
+# the detect scripts add their result keys in place; upload reads them back.
+# dump_json/load_json are also the JSON codec for server.py and scrape_one.py.
+
+def dump_json(obj, *, indent: bool = False) -> bytes:
+    """UTF-8 JSON bytes, indent-2 if asked (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=(orjson.OPT_INDENT_2 if indent else 0) | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+def load_json(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def read_json(p: Path):
+    return load_json(Path(p).read_bytes())
+
+def write_json(p: Path, data) -> None:
+    """Parsed pages are always written indent-2 (see needs_processing)."""
+    Path(p).write_bytes(dump_json(data, indent=True))
+
+# The result keys are appended by data.update() and dumped with indent=2, so on a
+# finished file they sit as top-level lines near the end. A literal newline can't
+# occur inside a JSON string, which keeps this from matching page text.
+SCAN_TAIL_BYTES = 8192
+
+def needs_processing(path: Path, *keys: str) -> bool:
+    """Cheap pre-check: False if the file's tail already has every top-level key.
+
+    Pass all the keys a stage writes. A miss only means we fall through to
+    the full parse, which re-checks.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - SCAN_TAIL_BYTES))
+        tail = f.read()
+    return any(f'\n  "{key}": '.encode() not in tail for key in keys)
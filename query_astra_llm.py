@@ -1,69 +1,154 @@
-import os, sys, re, time
+import os, sys, re, json, time, random, queue, threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from typing import List, Dict, Any
 from dotenv import load_dotenv
-from astrapy import DataAPIClient
+from astrapy.data_types import DataAPIVector
+from astrapy.exceptions import DataAPIHttpException, DataAPITimeoutException
+from astra_client import get_collection
+import httpx
 from sentence_transformers import SentenceTransformer
 from sentence_transformers.cross_encoder import CrossEncoder
-import requests
+import torch
+from watsonx_utils import SESSION, cached_chat, get_watsonx_token
+import llm_cache
+
+try:
+    import ahocorasick  # pyahocorasick
+except ImportError:  # per-term scan fallback
+    ahocorasick = None
 
 # ── Env ─────────────────────────────────────────────────────────────
 load_dotenv()
-ASTRA_DB_API_ENDPOINT = os.getenv("ASTRA_DB_API_ENDPOINT")
-ASTRA_DB_APPLICATION_TOKEN = os.getenv("ASTRA_DB_APPLICATION_TOKEN")
 COLLECTION_NAME = os.getenv("ASTRA_COLLECTION_NAME", "chatbot_chunks")
 
 WATSONX_PROJECT_ID = os.getenv("WATSONX_PROJECT_ID")
 WATSONX_URL = os.getenv("WATSONX_URL")
 MODEL_ID = os.getenv("WATSONX_MODEL_ID", "meta-llama/llama-3-3-70b-instruct")
-IBM_API_KEY = os.getenv("IBM_API_KEY")
 
-RUN_ID = sys.argv[1] if len(sys.argv) > 1 else None
 SITE_NAME = os.getenv("SITE_NAME", "unknown_site")
 
 # Retrieval + re-rank tuning (safe defaults for laptop testing)
 EMBEDDER_MODEL = os.getenv("EMBEDDER_MODEL", "all-mpnet-base-v2")
 CANDIDATE_K = int(os.getenv("CANDIDATE_K", "40"))      # vector top-K (larger since we filter client-side)
 FINAL_K = int(os.getenv("FINAL_K", "5"))               # return top-N after re-rank
+# Server-side hybrid (vector + BM25) via findAndRerank; needs a collection created
+# and loaded with ASTRA_HYBRID=1 (lexical + rerank enabled, $lexical on each chunk)
+ASTRA_HYBRID = os.getenv("ASTRA_HYBRID", "0") == "1"
 
 # Cross-Encoder config (TinyBERT fast default; upgrade later on server)
 CE_MODEL = os.getenv("CE_MODEL", "cross-encoder/ms-marco-TinyBERT-L-2-v2")
 CE_MAX_LEN = int(os.getenv("CE_MAX_LEN", "256"))
 CE_TIMEOUT_MS = int(os.getenv("CE_TIMEOUT_MS", "300"))  # CE budget per request
+CE_BATCH_SIZE = int(os.getenv("CE_BATCH_SIZE", "16"))
 
 # ── Astra client ────────────────────────────────────────────────────
-client = DataAPIClient(ASTRA_DB_APPLICATION_TOKEN)
-db = client.get_database_by_api_endpoint(ASTRA_DB_API_ENDPOINT)
-collection = db.get_collection(COLLECTION_NAME)
+# Shared, memoized handle from astra_client (request timeout: ASTRA_REQUEST_TIMEOUT_MS),
+# looked up per call so it follows ensure_db() and is the same one the server
+# pre-warms; a stalled call fails fast and gets retried instead of eating 30 s
+ASTRA_FIND_ATTEMPTS = int(os.getenv("ASTRA_FIND_ATTEMPTS", "3"))
+
+def _is_transient(e: Exception) -> bool:
+    if isinstance(e, DataAPIHttpException):
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return isinstance(e, (DataAPITimeoutException, httpx.TransportError))
+
+def with_astra_retries(fn, *, attempts: int = ASTRA_FIND_ATTEMPTS, base: float = 0.1, cap: float = 2.0):
+    """Run fn(), retrying transient Astra failures (429/5xx, timeouts, dropped
+    connections) with jittered exponential backoff. fn must fully consume its
+    cursor, since requests are only sent while iterating.
+    """
+    for n in range(attempts):
+        try:
+            return fn()
+        except Exception as e:
+            if n == attempts - 1 or not _is_transient(e):
+                raise
+            time.sleep(min(cap, base * 2 ** n) * random.uniform(0.75, 1.25))
 
 # ── Embeddings ─────────────────────────────────────────────────────
-embedder = SentenceTransformer(EMBEDDER_MODEL)
+# Inference only. Grad mode is per-thread, so this covers the main thread;
+# the embed worker and CE calls (server threads) use inference_mode explicitly.
+torch.set_grad_enabled(False)
+
+# GPU + fp16 when available (~3-5x throughput); CPU stays fp32
+MODEL_DEVICE = os.getenv("MODEL_DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
+USE_FP16 = MODEL_DEVICE.startswith("cuda")
+
+embedder = SentenceTransformer(EMBEDDER_MODEL, device=MODEL_DEVICE)
+if USE_FP16:
+    embedder.half()
+
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+EMBED_BATCH_WAIT_S = float(os.getenv("EMBED_BATCH_WAIT_S", "0.002"))
+
+class BatchEmbedder:
+    """Coalesce concurrent encode requests into one batched forward pass.
+
+    Callers (e.g. parallel /answer requests on the server's thread pool) block on
+    encode_one(); a background thread gathers whatever arrives within a short
+    window (up to max_batch_size texts) and encodes them together. A lone CLI
+    query just pays the wait window once.
+    """
+
+    def __init__(self, model, max_batch_size: int = 32, batch_wait_timeout_s: float = 0.002):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.batch_wait_timeout_s = batch_wait_timeout_s
+        self._q: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def encode_one(self, text: str):
+        self._ensure_worker()
+        fut: Future = Future()
+        self._q.put((text, fut))
+        return fut.result()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="batch-embedder", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._q.get()]
+            deadline = time.monotonic() + self.batch_wait_timeout_s
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with torch.inference_mode():
+                    vecs = self.model.encode([t for t, _ in batch], batch_size=len(batch),
+                                             convert_to_numpy=True, normalize_embeddings=True)
+                for (_, fut), v in zip(batch, vecs):
+                    fut.set_result(v)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+
+batch_embedder = BatchEmbedder(embedder, max_batch_size=EMBED_MAX_BATCH, batch_wait_timeout_s=EMBED_BATCH_WAIT_S)
 
 # ── Cross-Encoder (lazy load on first use) ─────────────────────────
 _CE = None
 def get_ce():
     global _CE
     if _CE is None:
-        _CE = CrossEncoder(CE_MODEL, max_length=CE_MAX_LEN)
+        _CE = CrossEncoder(CE_MODEL, max_length=CE_MAX_LEN, device=MODEL_DEVICE)
+        if USE_FP16:
+            _CE.model.half()
     return _CE
 
 # ── Watsonx helpers ────────────────────────────────────────────────
-def get_watsonx_token():
-    if not IBM_API_KEY:
-        raise RuntimeError("Missing IBM_API_KEY")
-    resp = requests.post(
-        "https://iam.cloud.ibm.com/identity/token",
-        data={"grant_type": "urn:ibm:params:oauth:grant-type:apikey", "apikey": IBM_API_KEY},
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-        timeout=30,
-    )
-    resp.raise_for_status()
-    return resp.json()["access_token"]
-
-def watsonx_chat_call(messages, *, temperature=0, max_tokens=600, timeout=60):
-    if not WATSONX_URL or not WATSONX_PROJECT_ID:
-        raise RuntimeError("Missing WATSONX_URL or WATSONX_PROJECT_ID")
+def _chat_request(messages, temperature, max_tokens):
+    """Headers and body shared by the chat and chat_stream endpoints."""
     token = get_watsonx_token()
-    url = f"{WATSONX_URL}/ml/v1/text/chat?version=2023-05-29"
     headers = {
         "Authorization": f"Bearer {token}",
         "Accept": "application/json",
@@ -76,7 +161,18 @@ def watsonx_chat_call(messages, *, temperature=0, max_tokens=600, timeout=60):
         "temperature": temperature,
         "max_tokens": max_tokens,
     }
-    r = requests.post(url, headers=headers, json=body, timeout=timeout)
+    return headers, body
+
+def watsonx_chat_call(messages, *, temperature=0, max_tokens=600, timeout=60):
+    if not WATSONX_URL or not WATSONX_PROJECT_ID:
+        raise RuntimeError("Missing WATSONX_URL or WATSONX_PROJECT_ID")
+    return cached_chat(MODEL_ID, messages, max_tokens, lambda: _chat(messages, temperature, max_tokens, timeout),
+                       temperature=temperature)
+
+def _chat(messages, temperature, max_tokens, timeout):
+    headers, body = _chat_request(messages, temperature, max_tokens)
+    url = f"{WATSONX_URL}/ml/v1/text/chat?version=2023-05-29"
+    r = SESSION.post(url, headers=headers, json=body, timeout=timeout)
     r.raise_for_status()
     j = r.json()
     content = ""
@@ -89,20 +185,60 @@ def watsonx_chat_call(messages, *, temperature=0, max_tokens=600, timeout=60):
             content = "\n".join(blk.get("text", "") for blk in c if blk.get("type") == "text").strip()
     return content
 
+def watsonx_chat_stream(messages, *, temperature=0, max_tokens=600, timeout=60):
+    """Yield answer text as Watsonx generates it (chat_stream SSE endpoint).
+
+    Shares the temperature=0 cache with watsonx_chat_call: a hit is yielded
+    in one piece, and a completed stream is stored for next time.
+    """
+    if not WATSONX_URL or not WATSONX_PROJECT_ID:
+        raise RuntimeError("Missing WATSONX_URL or WATSONX_PROJECT_ID")
+    cache_key = None
+    if temperature == 0:
+        cache_key = llm_cache.make_key(MODEL_ID, messages, max_tokens)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+    headers, body = _chat_request(messages, temperature, max_tokens)
+    headers["Accept"] = "text/event-stream"
+    url = f"{WATSONX_URL}/ml/v1/text/chat_stream?version=2023-05-29"
+    parts = []
+    with SESSION.post(url, headers=headers, json=body, timeout=timeout, stream=True) as r:
+        r.raise_for_status()
+        r.encoding = "utf-8"
+        for line in r.iter_lines(decode_unicode=True):
+            # SSE frames: "id: ..", "event: message", "data: {...}"
+            if not line or not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+            choices = json.loads(payload).get("choices") or []
+            delta = (choices[0].get("delta") or {}).get("content") if choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+    if cache_key:
+        llm_cache.put(cache_key, "".join(parts).strip())
+
 # ── Auto-hybrid keyword extraction (query-driven) ──────────────────
-STOPWORDS = {
+STOPWORDS = frozenset({
     "the","a","an","and","or","of","for","to","in","on","at","by","with","from","about",
     "what","which","who","whom","whose","is","are","was","were","be","been","being",
     "do","does","did","can","could","should","would","may","might","will","shall",
     "we","our","us","you","your","they","their","it","its","this","that","these","those",
     "please","show","tell","give","list","explain","how","why","when"
-}
+})
+
+_QUOTED = re.compile(r'"([^"]+)"')
+_NON_WORD = re.compile(r"[^\w+]+")
 
 def extract_query_terms(q: str) -> List[str]:
     q = q.strip()
-    phrases = re.findall(r'"([^"]+)"', q)
-    q_wo_quotes = re.sub(r'"[^"]+"', " ", q)
-    raw = re.split(r"[^\w+]+", q_wo_quotes.lower())
+    phrases = _QUOTED.findall(q)
+    q_wo_quotes = _QUOTED.sub(" ", q)
+    raw = _NON_WORD.split(q_wo_quotes.lower())
     words = [w for w in raw if w and len(w) >= 3 and w not in STOPWORDS]
     phrases = [p.strip().lower() for p in phrases if p.strip()]
     seen, ordered = set(), []
@@ -113,8 +249,21 @@ def extract_query_terms(q: str) -> List[str]:
     return ordered[:10]
 
 # ── Vector candidate search (no DB string operators) ───────────────
+# site_name/run_id are dropped: they only echo the filter. text has to come
+# along: the keyword gate, the CE and the answer prompt all read it.
+CANDIDATE_PROJECTION = {"url": 1, "title": 1, "text": 1, "chunk_index": 1}
+
+def query_vector(query_text: str) -> DataAPIVector:
+    """Embed the query for a $vector sort.
+
+    Wrapping it in DataAPIVector has astrapy ship it as packed float32 bytes
+    (base64 "$binary", ~4 KB for 768 dims) instead of a JSON list of 768
+    full-precision float literals (~15 KB).
+    """
+    return DataAPIVector(batch_embedder.encode_one(query_text).tolist())
+
 def vector_candidate_search(query_text: str, top_k: int) -> List[Dict[str, Any]]:
-    vec = embedder.encode(query_text).tolist()
+    vec = query_vector(query_text)
     # Read environment variables at runtime
     site_name = os.getenv("SITE_NAME", "unknown_site")
     run_id = os.getenv("RUN_ID")
@@ -126,72 +275,154 @@ def vector_candidate_search(query_text: str, top_k: int) -> List[Dict[str, Any]]
     find_kwargs = {
         "sort": {"$vector": vec},
         "limit": top_k,
-        "projection": {"url": 1, "title": 1, "text": 1, "run_id": 1, "site_name": 1, "chunk_index": 1},
+        "projection": CANDIDATE_PROJECTION,
         "filter": base_filter,
     }
-    return list(collection.find(**find_kwargs))
+    return with_astra_retries(lambda: list(get_collection(COLLECTION_NAME).find(**find_kwargs)))
+
+def hybrid_candidate_search(query_text: str, terms: List[str], top_k: int) -> List[Dict[str, Any]]:
+    """Vector + lexical retrieval fused and reranked by Astra; replaces keyword_gate."""
+    vec = query_vector(query_text)
+    site_name = os.getenv("SITE_NAME", "unknown_site")
+    run_id = os.getenv("RUN_ID")
+
+    base_filter: Dict[str, Any] = {"site_name": {"$eq": site_name}}
+    if run_id:
+        base_filter["run_id"] = {"$eq": run_id}
+    results = with_astra_retries(lambda: list(get_collection(COLLECTION_NAME).find_and_rerank(
+        base_filter,
+        sort={"$hybrid": {"$vector": vec, "$lexical": " ".join(terms) or query_text}},
+        projection=CANDIDATE_PROJECTION,
+        limit=top_k,
+        hybrid_limits=CANDIDATE_K,
+        include_scores=True,
+        rerank_on="text",  # no vectorize service → tell the reranker what to read
+        rerank_query=query_text,
+    )))
+    out = []
+    for r in results:
+        doc = r.document
+        # keep the CE fallback's vector tie-break working
+        doc["$similarity"] = float(r.scores.get("$vector") or 0.0)
+        out.append(doc)
+    return out
+
+def prepare_candidates(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Derive each candidate's lowercased text (gate/scorer) and CE input once."""
+    for c in candidates:
+        t = c.get("text") or ""
+        c["_t_lc"] = t.lower()
+        c["_t_ce"] = t[:1200]
+    return candidates
+
+# ── Multi-term matching (one Aho–Corasick pass per text) ───────────
+@lru_cache(maxsize=1024)
+def _word_pattern(term: str) -> re.Pattern:
+    return re.compile(r"\b" + re.escape(term) + r"\b")
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+def _at_boundary(t: str, i: int) -> bool:
+    """Same test as regex \\b at index i of t."""
+    before = i > 0 and _is_word_char(t[i - 1])
+    after = i < len(t) and _is_word_char(t[i])
+    return before != after
+
+@lru_cache(maxsize=64)
+def _term_automaton(terms: tuple):
+    A = ahocorasick.Automaton()
+    for i, term in enumerate(terms):
+        A.add_word(term, (i, term))
+    A.make_automaton()
+    return A
+
+def _find_terms(terms: tuple, t: str, *, whole_words: bool = False) -> set:
+    """Indices of terms occurring in (lowercased) t.
+
+    With whole_words, single-word terms must match on word boundaries;
+    phrases (terms with a space) are always plain substring matches.
+    """
+    if ahocorasick is None:
+        found = set()
+        for i, term in enumerate(terms):
+            if whole_words and " " not in term:
+                if _word_pattern(term).search(t):
+                    found.add(i)
+            elif term in t:
+                found.add(i)
+        return found
+
+    found = set()
+    for end, (i, term) in _term_automaton(terms).iter(t):
+        if i in found:
+            continue
+        if whole_words and " " not in term:
+            start = end - len(term) + 1
+            if not (_at_boundary(t, start) and _at_boundary(t, end + 1)):
+                continue
+        found.add(i)
+    return found
 
 # ── Client-side keyword gate (hybrid without DB operators) ─────────
 def keyword_gate(candidates: List[Dict[str, Any]], terms: List[str]) -> List[Dict[str, Any]]:
     if not candidates or not terms:
         return candidates
+    key = tuple(terms)
     require_all = len(terms) >= 2  # AND when 2+ strong terms; else OR
     out = []
     for c in candidates:
-        t = (c.get("text") or "").lower()
-        hits = sum(1 for term in terms if term in t)
+        hits = len(_find_terms(key, c["_t_lc"]))
         if (require_all and hits == len(terms)) or (not require_all and hits >= 1):
             out.append(c)
     # If gate filtered everything, fall back to original candidates
     return out if out else candidates
 
 # ── Lightweight fallback scorer (if CE times out) ──────────────────
-def keyword_overlap_score(query_terms: List[str], text: str) -> float:
-    if not query_terms or not text:
+def keyword_overlap_score(query_terms: List[str], text_lc: str) -> float:
+    """Overlap of query terms with already-lowercased text."""
+    if not query_terms or not text_lc:
         return 0.0
-    t = text.lower()
-    score = 0.0
-    for term in query_terms:
-        if " " in term:
-            if term in t:
-                score += 2.0
-        else:
-            if re.search(r"\b" + re.escape(term) + r"\b", t):
-                score += 1.0
-    return score
+    found = _find_terms(tuple(query_terms), text_lc, whole_words=True)
+    # phrases count double
+    return sum(2.0 if " " in query_terms[i] else 1.0 for i in found)
 
 # ── Cross-Encoder re-rank with timeout/fallback ────────────────────
 def rerank_candidates(question: str, candidates: List[Dict[str, Any]], query_terms: List[str]) -> List[Dict[str, Any]]:
     if not candidates:
         return []
+    # All of them make the cut anyway; CE can only reorder, so skip its budget
+    if len(candidates) <= FINAL_K:
+        return sorted(candidates, key=lambda c: c.get("$similarity", 0.0), reverse=True)
 
-    pairs = []
-    for c in candidates:
-        txt = (c.get("text") or "")[:1200]
-        pairs.append([question, txt])
+    # Length-sorted so each batch (padded to its longest pair) holds similar
+    # lengths and short chunks don't pay for long ones' padding
+    ordered = sorted(candidates, key=lambda c: len(c["_t_ce"]))
+    pairs = [[question, c["_t_ce"]] for c in ordered]
 
     start = time.time()
     try:
         ce = get_ce()
-        scores = ce.predict(pairs, convert_to_numpy=True)
+        with torch.inference_mode():
+            scores = ce.predict(pairs, batch_size=CE_BATCH_SIZE, convert_to_numpy=True)
         elapsed_ms = (time.time() - start) * 1000.0
         if elapsed_ms > CE_TIMEOUT_MS:
             raise TimeoutError(f"CE exceeded budget: {elapsed_ms:.1f} ms")
-        for c, s in zip(candidates, scores):
+        for c, s in zip(ordered, scores):
             c["_rerank_score"] = float(s)
         return sorted(candidates, key=lambda x: x.get("_rerank_score", 0.0), reverse=True)
     except Exception:
         # Fallback: keyword overlap + tie-break on vector similarity
         scored = []
         for c in candidates:
-            s_kw = keyword_overlap_score(query_terms, c.get("text", ""))
+            s_kw = keyword_overlap_score(query_terms, c["_t_lc"])
             s_vec = float(c.get("$similarity", 0.0))
             scored.append((s_kw, s_vec, c))
         scored.sort(key=lambda x: (x[0], x[1]), reverse=True)
         return [c for _, __, c in scored]
 
 # ── LLM answering ──────────────────────────────────────────────────
-def answer_with_llm(question, docs):
+def build_answer_messages(question, docs):
     context = "\n\n".join(d.get("text", "") for d in docs)
     system_msg = (
         f"You are the voice of the organization represented by {SITE_NAME}. "
@@ -199,34 +430,66 @@ def answer_with_llm(question, docs):
         "Respond in first-person plural. Only use the provided context; if unknown, say so."
     )
     user_text = f"Context:\n{context}\n\nQuestion: {question}\n\nAnswer:"
-    messages = [
+    return [
         {"role": "system", "content": system_msg},
         {"role": "user", "content": [{"type": "text", "text": user_text}]},
     ]
-    return watsonx_chat_call(messages, temperature=0, max_tokens=600)
+
+def answer_with_llm(question, docs):
+    return watsonx_chat_call(build_answer_messages(question, docs), temperature=0, max_tokens=600)
+
+def answer_with_llm_stream(question, docs):
+    """Like answer_with_llm, but yields text as it is generated."""
+    return watsonx_chat_stream(build_answer_messages(question, docs), temperature=0, max_tokens=600)
 
 # ── Orchestrator ───────────────────────────────────────────────────
-def retrieve_and_answer(q: str) -> Dict[str, Any]:
+def retrieve(q: str) -> List[Dict[str, Any]]:
+    """Top FINAL_K context docs for q (retrieval + re-rank, no LLM)."""
     terms = extract_query_terms(q)
-    # 1) vector candidates
-    cands = vector_candidate_search(q, top_k=CANDIDATE_K)
-    if not cands:
-        return {"answer": "No results in Astra DB.", "sources": []}
-    # 2) client-side keyword gate (hybrid)
-    gated = keyword_gate(cands, terms)
-    # 3) CE re-rank (fallback safe)
+    # 1) candidates: server-side hybrid, or vector top-K + client-side keyword gate
+    if ASTRA_HYBRID:
+        gated = prepare_candidates(hybrid_candidate_search(q, terms, top_k=FINAL_K * 2))
+    else:
+        cands = prepare_candidates(vector_candidate_search(q, top_k=CANDIDATE_K))
+        gated = keyword_gate(cands, terms)
+    if not gated:
+        return []
+    # 2) CE re-rank (fallback safe)
     ranked = rerank_candidates(q, gated, terms)
     top_docs = ranked[:FINAL_K]
-    # 4) LLM answer
+    for d in top_docs:
+        d.pop("_t_lc", None)
+        d.pop("_t_ce", None)
+    return top_docs
+
+def retrieve_many(queries: List[str], max_workers: int = 8) -> List[List[Dict[str, Any]]]:
+    """retrieve() for several queries at once (e.g. an eval set), in order.
+
+    Concurrent calls get their embeddings coalesced by batch_embedder into
+    one forward pass, and their Astra finds overlap on the client's pooled
+    connections instead of paying one round-trip after another.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        return list(ex.map(retrieve, queries))
+
+def retrieve_and_answer(q: str) -> Dict[str, Any]:
+    top_docs = retrieve(q)
+    if not top_docs:
+        return {"answer": "No results in Astra DB.", "sources": []}
+    # 3) LLM answer
     ans = answer_with_llm(q, top_docs)
     return {"answer": ans or "(no content)", "sources": top_docs}
 
 # ── CLI ────────────────────────────────────────────────────────────
-if __name__ == "__main__":
+def main(run_id: str | None = None):
+    """Interactive Ask: loop (run_id is only shown; filtering uses the RUN_ID env)."""
     print(f"💬 Using Astra collection: {COLLECTION_NAME}")
-    print(f"🌐 site_name: {SITE_NAME}" + (f" | run_id={RUN_ID}" if RUN_ID else ""))
+    print(f"🌐 site_name: {SITE_NAME}" + (f" | run_id={run_id}" if run_id else ""))
     print(f"🔎 embedder: {EMBEDDER_MODEL} | vector topK: {CANDIDATE_K} → final: {FINAL_K}")
+    if ASTRA_HYBRID:
+        print(f"🧬 hybrid: Astra findAndRerank ($vector + $lexical) → {FINAL_K * 2} candidates")
     print(f"🎯 re-rank: {CE_MODEL} (max_len={CE_MAX_LEN}, timeout={CE_TIMEOUT_MS}ms)")
+    print(f"🖥️  device: {MODEL_DEVICE}" + (" (fp16)" if USE_FP16 else ""))
 
     while True:
         try:
@@ -236,15 +499,24 @@ if __name__ == "__main__":
         if not q or q.lower() in {"exit", "quit"}:
             break
 
-        out = retrieve_and_answer(q)
+        sources = retrieve(q)
         print("\n--- Answer ---")
-        print(out["answer"])
+        if not sources:
+            print("No results in Astra DB.")
+            continue
+        # print tokens as they arrive instead of waiting for the full answer
+        for tok in answer_with_llm_stream(q, sources):
+            print(tok, end="", flush=True)
+        print()
 
         print("\n--- Sources ---")
-        for h in out["sources"]:
+        for h in sources:
             sim = h.get("$similarity", 0.0)
             rer = h.get("_rerank_score", None)
             if rer is not None:
                 print(f"{h.get('url')}  (vec={sim:.4f}, ce={rer:.4f})")
             else:
-                print(f"{h.get('url')}  (vec={sim:.4f})")
\ No newline at end of file
+                print(f"{h.get('url')}  (vec={sim:.4f})")
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,35 @@
+# query_cache.py
+import hashlib, os, pickle, time
+from pathlib import Path
+
+# Short-lived on-disk cache for debug-script Astra scans, so repeated runs
+# don't re-download thousands of docs. Set FIND_CACHE_TTL=0 to disable.
+CACHE_DIR = Path(os.getenv("FIND_CACHE_DIR", Path.home() / ".cache" / "zulfi"))
+CACHE_TTL = float(os.getenv("FIND_CACHE_TTL", "60"))
+
+def _cache_path(key_parts) -> Path:
+    h = hashlib.md5(repr(key_parts).encode()).hexdigest()[:16]
+    return CACHE_DIR / f"find-{h}.pkl"
+
+def cached_find(cl, filter: dict, *, key_parts: tuple, ttl: float = CACHE_TTL, **find_kwargs) -> list:
+    """list(cl.find(filter, **find_kwargs)), reusing a pickled result younger than `ttl` seconds.
+
+    `key_parts` should identify the database/collection (e.g. endpoint, collection
+    name); the filter and find kwargs are appended to it automatically.
+    """
+    path = _cache_path((*key_parts, filter, sorted(find_kwargs.items())))
+    if ttl > 0 and path.exists() and time.time() - path.stat().st_mtime < ttl:
+        try:
+            return pickle.loads(path.read_bytes())
+        except Exception:
+            pass  # corrupt/partial cache file → refetch
+    docs = list(cl.find(filter, **find_kwargs))
+    if ttl > 0:
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(pickle.dumps(docs))
+            tmp.replace(path)
+        except OSError:
+            pass
+    return docs
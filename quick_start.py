@@ -5,39 +5,34 @@ Runs dependency check and then starts the pipeline with the provided URL.
 """
 
 import sys
-import subprocess
-import time
 from pathlib import Path
 
 def run_dependency_check():
-    """Run the dependency check."""
+    """Run the dependency check (in this process)."""
     print("🔍 Running dependency check...")
-    try:
-        result = subprocess.run([
-            sys.executable, "check_dependencies.py"
-        ], check=True)
+    from check_dependencies import check
+    if check():
         print("✅ Dependency check passed!")
         return True
-    except subprocess.CalledProcessError:
-        print("❌ Dependency check failed!")
-        return False
+    print("❌ Dependency check failed!")
+    return False
 
 def run_pipeline(start_url, max_depth, max_pages):
-    """Run the main pipeline."""
+    """Run the main pipeline (in this process)."""
     print(f"\n🚀 Starting pipeline with:")
     print(f"   URL: {start_url}")
     print(f"   Max Depth: {max_depth}")
     print(f"   Max Pages: {max_pages}")
     
+    from run_all import main as run_all_main
     try:
-        result = subprocess.run([
-            sys.executable, "run_all.py", start_url, str(max_depth), str(max_pages)
-        ], check=True)
-        print("✅ Pipeline completed successfully!")
-        return True
-    except subprocess.CalledProcessError:
-        print("❌ Pipeline failed!")
-        return False
+        run_all_main(start_url, max_depth, max_pages)
+    except SystemExit as e:  # run_all exits on a failed stage
+        if e.code not in (None, 0):
+            print("❌ Pipeline failed!")
+            return False
+    print("✅ Pipeline completed successfully!")
+    return True
 
 def main():
     """Main function."""
@@ -1,79 +1,150 @@
 # run_all.py
 import sys
-import subprocess
+import importlib
 import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import os
-from urllib.parse import urlparse
+from urllib.parse import urlsplit
 
-USAGE = "Usage: python run_all.py <START_URL> <MAX_DEPTH:int> <MAX_PAGES:int>"
-
-if len(sys.argv) < 4:
-    print(USAGE)
-    sys.exit(1)
-
-START_URL = sys.argv[1]
-try:
-    MAX_DEPTH = int(sys.argv[2])
-    MAX_PAGES = int(sys.argv[3])
-except ValueError:
-    print(USAGE)
-    sys.exit(1)
-
-# ── NEW: Ensure Astra DB dynamically ─────────────────────────────────────────
-from astra_db_manager import ensure_db
-ensure_db(START_URL)   # sets env vars dynamically (DB + token)
+USAGE = "Usage: python run_all.py [--no-cache] [--run-id ID] <START_URL> <MAX_DEPTH:int> <MAX_PAGES:int>"
 
 # ---- Special-case: only fetch the Case Studies landing page, skip individual studies ----
 CASE_STUDY_INDEX = "https://www.incede.ai/resources/case-studies"
-if START_URL.rstrip("/") == CASE_STUDY_INDEX.rstrip("/"):
-    if MAX_DEPTH != 0:
-        print("ℹ️  Detected Case Studies index. Forcing MAX_DEPTH=0 to avoid crawling individual case studies.")
-    MAX_DEPTH = 0  # do not follow links beneath the landing page
-
-RUN_ID = time.strftime("%Y%m%d_%H%M%S")
-BASE_DIR = Path("data") / RUN_ID
-BASE_DIR.mkdir(parents=True, exist_ok=True)
-
-# 🔑 Extract domain for SITE_NAME
-parsed_url = urlparse(START_URL)
-site_name = parsed_url.netloc or START_URL
-os.environ["SITE_NAME"] = site_name
-
-print(f"🚀 Starting pipeline | run_id: {RUN_ID}")
-print(f"📂 Output dir: {BASE_DIR}")
-print(f"🌐 SITE_NAME set to: {site_name}")
-print(f"🔗 START_URL: {START_URL}")
-print(f"🧭 MAX_DEPTH:  {MAX_DEPTH}")
-print(f"📄 MAX_PAGES:  {MAX_PAGES}")
-
-def run(pyfile: str, *args: str):
-    """Run a Python script with the current interpreter; exit on failure."""
-    cmd = [sys.executable, pyfile, *map(str, args)]
-    print(f"\n=== Running: {' '.join(cmd)} ===")
-    r = subprocess.run(cmd)
-    if r.returncode != 0:
-        print(f"❌ Error running: {' '.join(cmd)}")
-        sys.exit(r.returncode)
-
-# 1) Crawl → writes data/<run_id>/{raw,parsed,master.json}
-run("crawl.py", START_URL, MAX_DEPTH, MAX_PAGES, RUN_ID)
-
-# 2) Detect page type
-run("detect_page_type.py", RUN_ID)
-
-# 3) Pick chunking strategy
-run("detect_chunking_strategy.py", RUN_ID)
-
-# 4) (FAISS step removed) — Astra-only pipeline
-
-# 5) Ensure vector collection exists in this DB
-run("create_astra_collection.py")
-
-# 6) Upload parsed JSON + embeddings to Astra DB collection
-run("upload_parsed_to_astra.py", RUN_ID)
-
-# 7) Launch Astra-backed Q&A loop (RAG with Watsonx)
-run("query_astra_llm.py", RUN_ID)
 
-print(f"\n✅ Done | run_id: {RUN_ID} | Stored in: {BASE_DIR}")
\ No newline at end of file
+def make_run_id() -> str:
+    """Timestamp run id with a microsecond suffix (YYYYmmdd_HHMMSS_ffffff).
+
+    Two pipelines started in the same second no longer share a data/ folder,
+    and ids still sort chronologically for get_latest_run_folder().
+    """
+    t = time.time()
+    return f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(t))}_{int(t % 1 * 1e6):06d}"
+
+def run(module: str, *args):
+    """Call <module>.main(*args) in this process; exit on failure.
+
+    Imported lazily, so each stage sees the env set by main() (ensure_db,
+    SITE_NAME) and heavy imports (torch, models) load once, only when needed.
+    """
+    print(f"\n=== Running: {module}.main({', '.join(map(repr, args))}) ===")
+    try:
+        importlib.import_module(module).main(*args)
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            print(f"❌ Error running: {module}")
+            sys.exit(e.code)
+    except Exception:
+        traceback.print_exc()
+        print(f"❌ Error running: {module}")
+        sys.exit(1)
+
+# Pages processed concurrently while the crawl is still running
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+
+def run_streaming(start_url: str, max_depth: int, max_pages: int, run_id: str, site_name: str):
+    """Crawl, and push each saved page through detect → chunking → upload as it lands.
+
+    Per page the stages stay in order (chunking reads page_type, upload reads
+    both), but pages overlap each other and the crawl, so total time tracks
+    the slowest stage instead of the sum of all of them.
+    """
+    print("\n=== Running: crawl → detect_page_type → detect_chunking_strategy → upload (per page) ===")
+    try:
+        import crawl, detect_page_type, detect_chunking_strategy, upload_parsed_to_astra
+        from astra_client import get_collection
+
+        collection = get_collection(upload_parsed_to_astra.COLLECTION_NAME)
+
+        def process_page(path: Path) -> int:
+            detect_page_type.process_file(path)
+            detect_chunking_strategy.process_file(path)
+            return upload_parsed_to_astra.upload_file(collection, path, run_id, site_name)
+
+        futures = {}
+        with ThreadPoolExecutor(max_workers=PIPELINE_WORKERS) as ex:
+            def on_saved(path: Path):
+                # a manual URL can be saved again by the crawl; process each file once
+                if path not in futures:
+                    futures[path] = ex.submit(process_page, path)
+
+            crawl.main(start_url, max_depth, max_pages, run_id, on_saved=on_saved)
+            uploaded = sum(f.result() for f in futures.values())
+        print(f"✅ Processed {len(futures)} pages, uploaded/updated {uploaded} chunks")
+    except Exception:
+        traceback.print_exc()
+        print("❌ Error running: streaming pipeline")
+        sys.exit(1)
+
+def main(start_url: str, max_depth: int, max_pages: int, run_id: str | None = None):
+    """Run the whole pipeline for one site; exits the process on a failed stage.
+
+    run_id names data/<run_id> and tags the uploaded chunks; the server passes
+    its own so its status, /answer filter and delete all refer to this run.
+    """
+    # ── NEW: Ensure Astra DB dynamically ─────────────────────────────────────
+    from astra_db_manager import ensure_db
+    ensure_db(start_url)   # sets env vars dynamically (DB + token)
+
+    if start_url.rstrip("/") == CASE_STUDY_INDEX.rstrip("/"):
+        if max_depth != 0:
+            print("ℹ️  Detected Case Studies index. Forcing MAX_DEPTH=0 to avoid crawling individual case studies.")
+        max_depth = 0  # do not follow links beneath the landing page
+
+    run_id = run_id or make_run_id()
+    base_dir = Path("data") / run_id
+    base_dir.mkdir(parents=True, exist_ok=True)
+
+    # 🔑 Extract domain for SITE_NAME
+    site_name = urlsplit(start_url).netloc or start_url
+    os.environ["SITE_NAME"] = site_name
+
+    print(f"🚀 Starting pipeline | run_id: {run_id}")
+    print(f"📂 Output dir: {base_dir}")
+    print(f"🌐 SITE_NAME set to: {site_name}")
+    print(f"🔗 START_URL: {start_url}")
+    print(f"🧭 MAX_DEPTH:  {max_depth}")
+    print(f"📄 MAX_PAGES:  {max_pages}")
+
+    # 1) Ensure vector collection exists in this DB (first, so pages can upload as they land)
+    run("create_astra_collection")
+
+    # 2) Crawl → data/<run_id>/{raw,parsed,master.ndjson}, and per saved page:
+    #    detect page type → pick chunking strategy → upload chunks + embeddings to Astra
+    #    (FAISS step removed — Astra-only pipeline)
+    run_streaming(start_url, max_depth, max_pages, run_id, site_name)
+
+    # 3) Launch Astra-backed Q&A loop (RAG with Watsonx)
+    run("query_astra_llm", run_id)
+
+    print(f"\n✅ Done | run_id: {run_id} | Stored in: {base_dir}")
+
+if __name__ == "__main__":
+    # --no-cache: ignore the parse/embedding and LLM caches for this run. Set
+    # before any stage module is imported, since they read these at import time.
+    if "--no-cache" in sys.argv:
+        sys.argv.remove("--no-cache")
+        os.environ["CONTENT_CACHE"] = "0"
+        os.environ["LLM_CACHE"] = "0"
+
+    run_id = None
+    if "--run-id" in sys.argv:
+        i = sys.argv.index("--run-id")
+        if i + 1 >= len(sys.argv):
+            print(USAGE)
+            sys.exit(1)
+        run_id = sys.argv[i + 1]
+        del sys.argv[i:i + 2]
+
+    if len(sys.argv) < 4:
+        print(USAGE)
+        sys.exit(1)
+
+    try:
+        max_depth, max_pages = int(sys.argv[2]), int(sys.argv[3])
+    except ValueError:
+        print(USAGE)
+        sys.exit(1)
+
+    main(sys.argv[1], max_depth, max_pages, run_id)
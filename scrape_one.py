@@ -1,21 +1,56 @@
-import asyncio, hashlib, json, re, sys, time
+import asyncio, hashlib, re, sys, time
 from pathlib import Path
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from playwright.async_api import async_playwright
+import content_cache
+from parsed_io import dump_json, load_json
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # bs4 + lxml fallback
+    LexborHTMLParser = None
 
 RAW = Path("data/raw"); PARSED = Path("data/parsed"); MASTER = Path("data/master.json")
 RAW.mkdir(parents=True, exist_ok=True); PARSED.mkdir(parents=True, exist_ok=True)
 
+_SCHEME = re.compile(r"^https?://")
+
 def slug(url:str)->str:
-    host = re.sub(r"^https?://","",url).split("/")[0]
-    h = hashlib.md5(url.encode()).hexdigest()[:10]
+    host = _SCHEME.sub("", url, count=1).split("/", 1)[0]
+    h = hashlib.blake2b(url.encode(), digest_size=5).hexdigest()  # 10 hex chars, as before
     return f"{host}_{h}"
 
-def extract(html:str):
-    soup = BeautifulSoup(html, "html.parser")
-    for t in soup(["script","style","noscript"]): t.decompose()
+# Only build <title> and <body>; head scripts/styles/meta never become nodes
+STRAINER = SoupStrainer(["title","body"])
+_WS = re.compile(r"\s+")
+
+def extract(html:bytes):
+    """(title, text, links) from UTF-8 HTML bytes; selectolax when installed."""
+    if LexborHTMLParser is None:
+        return _extract_bs4(html)
+    tree = LexborHTMLParser(html)  # bytes are read as UTF-8, like the bs4 path
+    tree.strip_tags(["script","style","noscript"])
+    title_node = tree.css_first("title")
+    title_text = title_node.text(deep=True, separator=" ") if title_node else ""
+    title = title_node.text(strip=True) if title_node else ""
+    # same text as the strained bs4 soup: <title> first, then <body>
+    body_text = tree.body.text(deep=True, separator=" ") if tree.body else ""
+    text = _WS.sub(" ", f"{title_text} {body_text}").strip()
+    links = []
+    for a in tree.css("a[href]"):
+        href = (a.attributes.get("href") or "").strip()
+        if href.startswith("#") or href.lower().startswith("javascript:"):
+            continue
+        links.append(href)
+    return title, text, links
+
+def _extract_bs4(html:bytes):
+    # html is our own UTF-8 encoding of the DOM, so don't let a <meta charset>
+    # copied from the original page override it
+    soup = BeautifulSoup(html, "lxml", parse_only=STRAINER, from_encoding="utf-8")
+    for t in soup.find_all(["script","style","noscript"]): t.decompose()
     title = (soup.title.string.strip() if soup.title and soup.title.string else "")
-    text = " ".join(soup.get_text(" ").split())
+    text = _WS.sub(" ", soup.get_text(" ")).strip()
     links = []
     for a in soup.find_all("a", href=True):
         href = a["href"].strip()
@@ -24,50 +59,115 @@ def extract(html:str):
         links.append(href)
     return title, text, links
 
-async def fetch(url:str):
-    async with async_playwright() as p:
-        b = await p.chromium.launch(headless=True)
-        ctx = await b.new_context()
-        page = await ctx.new_page()
-        await page.goto(url, wait_until="networkidle", timeout=60000)
-        html = await page.content()
-        await b.close()
-    return html
-
-def save_individual(url:str, html:str, title:str, text:str, links:list[str]):
+def extract_cached(html:bytes):
+    """extract() memoised on the HTML (namespaced apart from crawl.parse entries)."""
+    key = content_cache.content_hash("scrape_one", html)
+    hit = content_cache.get_parsed(key)
+    if hit is not None:
+        return hit["title"], hit["text"], hit["links"]
+    title, text, links = extract(html)
+    content_cache.put_parsed(key, {"title": title, "text": text, "links": links})
+    return title, text, links
+
+class BrowserPool:
+    """One Chromium + one context, shared by every fetch (no per-URL launch)."""
+    def __init__(self):
+        self._pw = None
+        self._browser = None
+        self._ctx = None
+
+    async def start(self):
+        self._pw = await async_playwright().start()
+        self._browser = await self._pw.chromium.launch(headless=True)
+        self._ctx = await self._browser.new_context()
+        return self
+
+    async def close(self):
+        if self._browser:
+            await self._browser.close()
+        if self._pw:
+            await self._pw.stop()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+async def fetch(pool:BrowserPool, url:str):
+    page = await pool._ctx.new_page()
+    try:
+        # domcontentloaded: networkidle often never settles on sites with polling/analytics
+        await page.goto(url, wait_until="domcontentloaded", timeout=15000)
+        # encode once; the bytes are written and parsed as-is from here on
+        return (await page.content()).encode("utf-8")
+    finally:
+        await page.close()
+
+async def fetch_many(pool:BrowserPool, urls:list[str], concurrency:int=5):
+    """UTF-8 HTML bytes per URL, in order; a failed URL yields its exception instead."""
+    sem = asyncio.Semaphore(concurrency)
+    async def one(u):
+        async with sem:
+            return await fetch(pool, u)
+    return await asyncio.gather(*(one(u) for u in urls), return_exceptions=True)
+
+def save_individual(url:str, html:bytes, title:str, text:str, links:list[str]):
     name = slug(url)
-    (RAW / f"{name}.html").write_text(html, encoding="utf-8")
+    (RAW / f"{name}.html").write_bytes(html)
     item = {
         "id": name,
         "url": url,
         "title": title,
         "timestamp": int(time.time()),
+        "content_hash": content_cache.content_hash(html),
         "text": text,
         "links": links,
     }
-    (PARSED / f"{name}.json").write_text(json.dumps(item, ensure_ascii=False, indent=2), encoding="utf-8")
+    (PARSED / f"{name}.json").write_bytes(dump_json(item, indent=True))
     return item
 
-def rebuild_master():
-    all_items = []
-    for p in PARSED.glob("*.json"):
-        try:
-            all_items.append(json.loads(p.read_text(encoding="utf-8")))
-        except Exception:
-            pass
-    MASTER.write_text(json.dumps({"count": len(all_items), "items": all_items}, ensure_ascii=False, indent=2), encoding="utf-8")
+def load_master() -> dict:
+    if MASTER.exists():
+        return load_json(MASTER.read_bytes())
+    return {"count": 0, "items": []}
+
+def upsert_master(items:list[dict]) -> dict:
+    """Merge new/updated items into master.json by url (one read, one atomic write)."""
+    master = load_master()
+    # keyed by url rather than id so entries saved under an older slug scheme get replaced
+    idx = {it["url"]: k for k, it in enumerate(master["items"])}
+    for item in items:
+        if item["url"] in idx:
+            master["items"][idx[item["url"]]] = item
+        else:
+            idx[item["url"]] = len(master["items"])
+            master["items"].append(item)
+    master["count"] = len(master["items"])
+    # compact: master is machine-read; per-page parsed/*.json stay pretty-printed
+    tmp = MASTER.with_suffix(".json.tmp")
+    tmp.write_bytes(dump_json(master))
+    tmp.replace(MASTER)
+    return master
 
 async def main():
     if len(sys.argv) < 2:
-        print("Usage: python scrape_one.py <URL>")
+        print("Usage: python scrape_one.py <URL> [<URL> ...]")
         sys.exit(1)
-    url = sys.argv[1]
-    html = await fetch(url)
-    title, text, links = extract(html)
-    item = save_individual(url, html, title, text, links)
-    rebuild_master()
-    print(f"Saved: data/parsed/{item['id']}.json")
-    print(f"Updated: data/master.json  (count={len(json.loads(MASTER.read_text(encoding='utf-8'))['items'])})")
+    urls = sys.argv[1:]
+    async with BrowserPool() as pool:
+        pages = await fetch_many(pool, urls)
+    items = []
+    for url, html in zip(urls, pages):
+        if isinstance(html, Exception):
+            print(f"Failed: {url} ({html})")
+            continue
+        title, text, links = extract_cached(html)
+        item = save_individual(url, html, title, text, links)
+        items.append(item)
+        print(f"Saved: data/parsed/{item['id']}.json")
+    master = upsert_master(items)
+    print(f"Updated: data/master.json  (count={master['count']})")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
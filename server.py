@@ -3,19 +3,22 @@ import sys
 import time
 import asyncio
 import subprocess
-import json
+import shutil
+from collections import deque
 from pathlib import Path
-from typing import Optional, Dict, Any
+from urllib.parse import urlsplit
+from typing import Optional, Dict, Any, Deque
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from dotenv import load_dotenv
 
-from astrapy import DataAPIClient
+from run_all import make_run_id
+from parsed_io import dump_json, load_json
 
 # Load env (only for IBM Watson and optional settings)
 load_dotenv()
@@ -33,31 +36,38 @@ API_KEY = os.getenv("API_KEY", "")  # optional auth key
 # No hardcoded values loaded at startup
 
 # ─────────────────────────────────────────────
-# Astra + embeddings (will be initialized dynamically)
+# Astra connections (warm, reused across requests)
 # ─────────────────────────────────────────────
-client = None
-db = None
-collection = None
+class AstraPool:
+    """(client, db, collection) for the current Astra env, from astra_client.
+
+    astra_client memoizes per (token, endpoint, collection name), so a
+    pipeline run that points the env at a new database adds an entry instead
+    of throwing away the warm connection (DNS, TLS, HTTP pool) of the
+    previous one, and query_astra_llm (/answer, /chat/test) reads through
+    the same cache, so warming here warms the handle retrieval uses.
+    """
+    def get(self):
+        if not os.getenv("ASTRA_DB_APPLICATION_TOKEN") or not os.getenv("ASTRA_DB_API_ENDPOINT"):
+            raise HTTPException(
+                status_code=400,
+                detail="Astra DB not configured. Please run a pipeline first to set up the database connection."
+            )
+        # astrapy (httpx, SSL stack) is imported on first use, not at server start
+        import astra_client
+        return astra_client.get_client(), astra_client.get_database(), astra_client.get_collection()
 
 def get_astra_connection():
-    """Get or create Astra DB connection using current environment variables."""
-    global client, db, collection
-    
-    # Check if Astra DB is configured
-    astra_token = os.getenv("ASTRA_DB_APPLICATION_TOKEN")
-    astra_endpoint = os.getenv("ASTRA_DB_API_ENDPOINT")
-    
-    if not astra_token or not astra_endpoint:
-        raise HTTPException(
-            status_code=400, 
-            detail="Astra DB not configured. Please run a pipeline first to set up the database connection."
-        )
-    
-    if not client or not db or not collection:
-        client = DataAPIClient(astra_token)
-        db = client.get_database_by_api_endpoint(astra_endpoint)
-        collection = db.get_collection(os.getenv("ASTRA_COLLECTION_NAME", "chatbot_chunks"))
-    return client, db, collection
+    """Get the (client, db, collection) for the current environment variables."""
+    return AstraPool().get()
+
+def warm_astra_connection():
+    """Open the shared collection's connection (TLS, HTTP/2) ahead of the first query.
+
+    Getting the handles makes no request, so issue one tiny read on it.
+    """
+    _, _, collection = get_astra_connection()
+    collection.find_one({}, projection={"_id": 1})
 
 # ─────────────────────────────────────────────
 # FastAPI app
@@ -68,6 +78,12 @@ async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Starting Website Chatbot API...")
     load_pipeline_history()
+    if os.getenv("ASTRA_DB_APPLICATION_TOKEN") and os.getenv("ASTRA_DB_API_ENDPOINT"):
+        # Pay client setup + TLS before the first request instead of during it
+        try:
+            await asyncio.to_thread(warm_astra_connection)
+        except Exception as e:
+            print(f"⚠️ Astra DB pre-warm failed: {e}")
     yield
     # Shutdown
     print("💾 Saving pipeline history...")
@@ -101,52 +117,111 @@ class PipelineRequest(BaseModel):
     max_depth: int = 2
     max_pages: int = 50
 
+MAX_LOG_LINES = 2000
+
 class PipelineStatus(BaseModel):
     run_id: str
     status: str  # "running", "completed", "failed"
     progress: Dict[str, Any]
-    logs: list[str]
+    logs: Deque[str]
     start_time: Optional[str] = None
     end_time: Optional[str] = None
     site_name: Optional[str] = None
     start_url: Optional[str] = None
 
+    @field_validator("logs")
+    @classmethod
+    def _bound_logs(cls, v):
+        # Ring buffer: a long crawl keeps only its most recent lines, so status
+        # responses and history snapshots stay a bounded size
+        return deque(v, maxlen=MAX_LOG_LINES)
+
 # Global pipeline status tracking
 pipeline_status: Dict[str, PipelineStatus] = {}
 
-# Pipeline history file path
+# Pipeline history: a full snapshot (written on shutdown) plus an append-only
+# event log for everything since, so a status change or a batch of log lines
+# costs one small append instead of re-encoding every run's history
 PIPELINE_HISTORY_FILE = "pipeline_history.json"
+PIPELINE_EVENTS_FILE = "pipeline_events.jsonl"
+# Snapshot + truncate the event log once it grows past this, so a long-running
+# server doesn't accumulate (and replay at startup) an unbounded file
+PIPELINE_EVENTS_MAX_BYTES = int(os.getenv("PIPELINE_EVENTS_MAX_BYTES", str(8 * 1024 * 1024)))
+
+def _status_dict(status: PipelineStatus) -> dict:
+    return {
+        "run_id": status.run_id,
+        "status": status.status,
+        "progress": status.progress,
+        "logs": list(status.logs),
+        "start_time": status.start_time,
+        "end_time": status.end_time,
+        "site_name": status.site_name,
+        "start_url": status.start_url
+    }
+
+def append_event(run_id: str, event: dict):
+    """Append one pipeline event to PIPELINE_EVENTS_FILE."""
+    try:
+        with open(PIPELINE_EVENTS_FILE, 'ab') as f:
+            f.write(dump_json({"run_id": run_id, "ts": time.time(), **event}) + b"\n")
+            size = f.tell()
+    except Exception as e:
+        print(f"❌ Error appending pipeline event: {e}")
+        return
+    if size > PIPELINE_EVENTS_MAX_BYTES:
+        save_pipeline_history()
+
+def add_logs(run_id: str, *lines: str):
+    """Append log lines to a run, in memory and in the event log."""
+    if lines:
+        pipeline_status[run_id].logs.extend(lines)
+        append_event(run_id, {"type": "logs", "lines": list(lines)})
+
+def record_status(run_id: str):
+    """Log the run's current status/progress/end_time as an event."""
+    st = pipeline_status[run_id]
+    append_event(run_id, {"type": "status", "status": st.status, "progress": st.progress, "end_time": st.end_time})
+    if st.status in ("completed", "failed"):
+        save_pipeline_history()  # the run is final: fold its events into the snapshot
+
+def _apply_event(ev: dict):
+    run_id = ev.get("run_id")
+    kind = ev.get("type")
+    if kind == "start":
+        pipeline_status[run_id] = PipelineStatus(**ev["state"])
+    elif kind == "delete":
+        pipeline_status.pop(run_id, None)
+    elif run_id in pipeline_status:
+        st = pipeline_status[run_id]
+        if kind == "logs":
+            st.logs.extend(ev["lines"])
+        elif kind == "status":
+            st.status = ev["status"]
+            st.progress = ev["progress"]
+            st.end_time = ev.get("end_time")
 
 def save_pipeline_history():
-    """Save pipeline status to disk."""
+    """Snapshot pipeline status to disk and reset the event log it now covers."""
     try:
-        # Convert PipelineStatus objects to dictionaries
-        history_data = {}
-        for run_id, status in pipeline_status.items():
-            history_data[run_id] = {
-                "run_id": status.run_id,
-                "status": status.status,
-                "progress": status.progress,
-                "logs": status.logs,
-                "start_time": status.start_time,
-                "end_time": status.end_time,
-                "site_name": status.site_name,
-                "start_url": status.start_url
-            }
+        history_data = {run_id: _status_dict(status) for run_id, status in pipeline_status.items()}
         
-        with open(PIPELINE_HISTORY_FILE, 'w') as f:
-            json.dump(history_data, f, indent=2)
+        tmp = PIPELINE_HISTORY_FILE + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(dump_json(history_data, indent=True))
+        os.replace(tmp, PIPELINE_HISTORY_FILE)
+        open(PIPELINE_EVENTS_FILE, 'wb').close()
         print(f"✅ Pipeline history saved to {PIPELINE_HISTORY_FILE}")
     except Exception as e:
         print(f"❌ Error saving pipeline history: {e}")
 
 def load_pipeline_history():
-    """Load pipeline status from disk."""
+    """Load the last snapshot, then replay the event log on top of it."""
     global pipeline_status
     try:
         if os.path.exists(PIPELINE_HISTORY_FILE):
-            with open(PIPELINE_HISTORY_FILE, 'r') as f:
-                history_data = json.load(f)
+            with open(PIPELINE_HISTORY_FILE, 'rb') as f:
+                history_data = load_json(f.read())
             
             # Convert dictionaries back to PipelineStatus objects
             for run_id, data in history_data.items():
@@ -163,6 +238,20 @@ def load_pipeline_history():
             print(f"✅ Pipeline history loaded from {PIPELINE_HISTORY_FILE} ({len(pipeline_status)} runs)")
         else:
             print(f"📝 No existing pipeline history found at {PIPELINE_HISTORY_FILE}")
+
+        if os.path.exists(PIPELINE_EVENTS_FILE):
+            replayed = 0
+            with open(PIPELINE_EVENTS_FILE, 'rb') as f:
+                for line in f:
+                    try:
+                        ev = load_json(line)
+                    except ValueError:
+                        continue  # torn last line from a crash mid-append
+                    _apply_event(ev)
+                    replayed += 1
+            if replayed:
+                print(f"✅ Replayed {replayed} pipeline events from {PIPELINE_EVENTS_FILE}")
+                save_pipeline_history()  # fold them into a fresh snapshot
     except Exception as e:
         print(f"❌ Error loading pipeline history: {e}")
         pipeline_status = {}
@@ -171,14 +260,9 @@ def load_pipeline_history():
 # Pipeline Management
 # ─────────────────────────────────────────────
 
-async def run_pipeline_background(run_id: str, start_url: str, max_depth: int, max_pages: int):
+async def run_pipeline_background(run_id: str, start_url: str, max_depth: int, max_pages: int, site_name: str):
     """Run the pipeline in the background and update status."""
     try:
-        # Extract site name from URL
-        from urllib.parse import urlparse
-        parsed_url = urlparse(start_url)
-        site_name = parsed_url.netloc or start_url
-        
         pipeline_status[run_id] = PipelineStatus(
             run_id=run_id,
             status="running",
@@ -188,25 +272,29 @@ async def run_pipeline_background(run_id: str, start_url: str, max_depth: int, m
             site_name=site_name,
             start_url=start_url
         )
-        save_pipeline_history()  # Save initial status
+        append_event(run_id, {"type": "start", "state": _status_dict(pipeline_status[run_id])})
         
         # Add initial setup information (like run_all.py does)
         os.environ["SITE_NAME"] = site_name
         
-        pipeline_status[run_id].logs.append(f"🚀 Starting pipeline | run_id: {run_id}")
-        pipeline_status[run_id].logs.append(f"📂 Output dir: data/{run_id}")
-        pipeline_status[run_id].logs.append(f"🌐 SITE_NAME set to: {site_name}")
-        pipeline_status[run_id].logs.append(f"🔗 START_URL: {start_url}")
-        pipeline_status[run_id].logs.append(f"🧭 MAX_DEPTH:  {max_depth}")
-        pipeline_status[run_id].logs.append(f"📄 MAX_PAGES:  {max_pages}")
+        add_logs(
+            run_id,
+            f"🚀 Starting pipeline | run_id: {run_id}",
+            f"📂 Output dir: data/{run_id}",
+            f"🌐 SITE_NAME set to: {site_name}",
+            f"🔗 START_URL: {start_url}",
+            f"🧭 MAX_DEPTH:  {max_depth}",
+            f"📄 MAX_PAGES:  {max_pages}",
+        )
         
         # Ensure Astra DB is set up for this URL
-        pipeline_status[run_id].logs.append("Setting up Astra DB...")
+        add_logs(run_id, "Setting up Astra DB...")
         pipeline_status[run_id].progress = {
             "step": "Setting up Astra DB",
             "current_step": 1,
             "total_steps": 3
         }
+        record_status(run_id)
         
         # Import and run ensure_db with output capture
         from astra_db_manager import ensure_db
@@ -221,19 +309,10 @@ async def run_pipeline_background(run_id: str, start_url: str, max_depth: int, m
         # Add captured output to logs
         captured_output = f.getvalue().strip()
         if captured_output:
-            for line in captured_output.split('\n'):
-                if line.strip():
-                    pipeline_status[run_id].logs.append(line.strip())
-        
-        pipeline_status[run_id].logs.append("Astra DB setup completed")
-        pipeline_status[run_id].logs.append(f"Environment variables set: ASTRA_DB_API_ENDPOINT={os.getenv('ASTRA_DB_API_ENDPOINT', 'NOT_SET')[:50]}...")
+            add_logs(run_id, *(line.strip() for line in captured_output.split('\n') if line.strip()))
         
-        # Refresh the global Astra connection with new environment variables
-        global client, db, collection
-        client = None
-        db = None
-        collection = None
-        get_astra_connection()  # Initialize with new environment variables
+        add_logs(run_id, "Astra DB setup completed")
+        add_logs(run_id, f"Environment variables set: ASTRA_DB_API_ENDPOINT={os.getenv('ASTRA_DB_API_ENDPOINT', 'NOT_SET')[:50]}...")
         
         # Run run_all.py directly with the parameters (exactly like terminal)
         pipeline_status[run_id].progress = {
@@ -241,10 +320,13 @@ async def run_pipeline_background(run_id: str, start_url: str, max_depth: int, m
             "current_step": 2,
             "total_steps": 3
         }
+        record_status(run_id)
         
-        # Run run_all.py with the exact same command as terminal
-        cmd = [sys.executable, "run_all.py", start_url, str(max_depth), str(max_pages)]
-        pipeline_status[run_id].logs.append(f"=== Running: {' '.join(cmd)} ===")
+        # Run run_all.py with the exact same command as terminal. One child per
+        # run (its stages run in-process): os.environ (SITE_NAME, Astra endpoint)
+        # and stdout are process-wide, so concurrent runs need their own process.
+        cmd = [sys.executable, "run_all.py", "--run-id", run_id, start_url, str(max_depth), str(max_pages)]
+        add_logs(run_id, f"=== Running: {' '.join(cmd)} ===")
         
         process = await asyncio.create_subprocess_exec(
             *cmd,
@@ -254,30 +336,33 @@ async def run_pipeline_background(run_id: str, start_url: str, max_depth: int, m
             env=os.environ.copy()  # Pass current environment variables
         )
         
-        # Stream output in real-time
-        output_lines = []
+        # Stream output in real-time: read in chunks and split lines ourselves
+        # rather than awaiting one readline() per line
+        buf = b""
         while True:
-            line = await process.stdout.readline()
-            if not line:
+            chunk = await process.stdout.read(8192)
+            if not chunk:
                 break
-            
-            # Decode and add to logs
-            line_text = line.decode().strip()
-            if line_text:  # Only add non-empty lines
-                pipeline_status[run_id].logs.append(line_text)
-                output_lines.append(line_text)
+            buf += chunk
+            *lines, buf = buf.split(b"\n")
+            # one event per chunk; only non-empty lines are kept
+            add_logs(run_id, *filter(None, (line.decode(errors="replace").strip() for line in lines)))
+        tail = buf.decode(errors="replace").strip()
+        if tail:  # last line without a trailing newline
+            add_logs(run_id, tail)
         
         # Wait for process to complete
         await process.wait()
         
         if process.returncode != 0:
             error_msg = f"Error in run_all.py (exit code: {process.returncode})"
-            pipeline_status[run_id].logs.append(error_msg)
+            add_logs(run_id, error_msg)
             pipeline_status[run_id].status = "failed"
             pipeline_status[run_id].end_time = time.strftime("%Y-%m-%d %H:%M:%S")
+            record_status(run_id)  # Log failed status
             return
         
-        pipeline_status[run_id].logs.append("✅ Pipeline completed successfully")
+        add_logs(run_id, "✅ Pipeline completed successfully")
         
         pipeline_status[run_id].status = "completed"
         pipeline_status[run_id].progress = {
@@ -285,15 +370,22 @@ async def run_pipeline_background(run_id: str, start_url: str, max_depth: int, m
             "current_step": 3,
             "total_steps": 3
         }
-        pipeline_status[run_id].logs.append(f"\n✅ Done | run_id: {run_id} | Stored in: data/{run_id}")
+        add_logs(run_id, f"\n✅ Done | run_id: {run_id} | Stored in: data/{run_id}")
         pipeline_status[run_id].end_time = time.strftime("%Y-%m-%d %H:%M:%S")
-        save_pipeline_history()  # Save final status
+        record_status(run_id)  # Log final status
+
+        # The collection exists now: warm its pooled connection (possibly a new
+        # Astra target) so the first /answer against it doesn't pay for TLS
+        try:
+            await asyncio.to_thread(warm_astra_connection)
+        except Exception as e:
+            print(f"⚠️ Astra DB pre-warm failed: {e}")
         
     except Exception as e:
         pipeline_status[run_id].status = "failed"
-        pipeline_status[run_id].logs.append(f"Pipeline failed with error: {str(e)}")
+        add_logs(run_id, f"Pipeline failed with error: {str(e)}")
         pipeline_status[run_id].end_time = time.strftime("%Y-%m-%d %H:%M:%S")
-        save_pipeline_history()  # Save error status
+        record_status(run_id)  # Log error status
 
 # ─────────────────────────────────────────────
 # API Endpoints
@@ -356,10 +448,13 @@ async def start_pipeline(req: PipelineRequest, background_tasks: BackgroundTasks
         raise HTTPException(status_code=401, detail="Unauthorized")
     
     # Generate run_id
-    run_id = time.strftime("%Y%m%d_%H%M%S")
+    run_id = make_run_id()
+    
+    # Site name = URL host, derived once here and passed along
+    site_name = urlsplit(req.start_url).netloc or req.start_url
     
     # Start pipeline in background
-    background_tasks.add_task(run_pipeline_background, run_id, req.start_url, req.max_depth, req.max_pages)
+    background_tasks.add_task(run_pipeline_background, run_id, req.start_url, req.max_depth, req.max_pages, site_name)
     
     return {
         "run_id": run_id,
@@ -431,7 +526,7 @@ def get_pipeline_history(x_api_key: Optional[str] = Header(default=None)):
     return {"history": history}
 
 @app.delete("/pipeline/{run_id}")
-def delete_pipeline(run_id: str, x_api_key: Optional[str] = Header(default=None)):
+async def delete_pipeline(run_id: str, background_tasks: BackgroundTasks, x_api_key: Optional[str] = Header(default=None)):
     """Delete a pipeline run and its associated data."""
     # optional auth
     if API_KEY and x_api_key != API_KEY:
@@ -439,40 +534,32 @@ def delete_pipeline(run_id: str, x_api_key: Optional[str] = Header(default=None)
     
     if run_id in pipeline_status:
         del pipeline_status[run_id]
-        save_pipeline_history()  # Save after deletion
+        append_event(run_id, {"type": "delete"})
     
-    # Also try to delete the data directory
+    # Also delete the data directory. The rename is atomic and instant; the
+    # (possibly large) tree is removed after the response, in the threadpool.
+    # The leading dot keeps it out of "latest run folder" lookups meanwhile.
     data_dir = Path(f"data/{run_id}")
     if data_dir.exists():
-        import shutil
-        shutil.rmtree(data_dir)
+        doomed = data_dir.with_name(f".deleting_{run_id}_{time.time_ns()}")
+        data_dir.rename(doomed)
+        background_tasks.add_task(shutil.rmtree, doomed, ignore_errors=True)
     
     return {"message": f"Pipeline {run_id} deleted"}
 
-@app.post("/answer")
-def answer(req: AnswerRequest, x_api_key: Optional[str] = Header(default=None)):
-    # optional auth
-    if API_KEY and x_api_key != API_KEY:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-
+def _answer_sync(req: AnswerRequest) -> dict:
+    """Shared body of /answer and /chat/test (blocking: Astra + Watsonx calls)."""
     # Use the same logic as query_astra_llm.py
     try:
         # Set environment variables for the specific run_id if provided
         if req.run_id:
             os.environ["RUN_ID"] = req.run_id
-            # Set up the Astra DB environment variables for this run
-            # Use the current server's Astra DB configuration
-            if os.getenv("ASTRA_DB_API_ENDPOINT"):
-                os.environ["ASTRA_DB_API_ENDPOINT"] = os.getenv("ASTRA_DB_API_ENDPOINT")
-            if os.getenv("ASTRA_DB_APPLICATION_TOKEN"):
-                os.environ["ASTRA_DB_APPLICATION_TOKEN"] = os.getenv("ASTRA_DB_APPLICATION_TOKEN")
             # Set SITE_NAME based on run_id (extract from run_id or use default)
             if not os.getenv("SITE_NAME"):
                 os.environ["SITE_NAME"] = "hprc.in"  # Default for now
         
-        # Import the retrieve_and_answer function from query_astra_llm
-        import sys
-        sys.path.append('.')
+        # Imported on first query (it loads torch + the embedding models);
+        # later calls just hit the sys.modules cache
         from query_astra_llm import retrieve_and_answer
         
         # Call the same function that the terminal uses
@@ -492,49 +579,61 @@ def answer(req: AnswerRequest, x_api_key: Optional[str] = Header(default=None)):
     except Exception as e:
         return {"answer": f"Error processing query: {str(e)}", "sources": []}
 
+@app.post("/answer")
+async def answer(req: AnswerRequest, x_api_key: Optional[str] = Header(default=None)):
+    # optional auth
+    if API_KEY and x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    # Run the blocking retrieval + LLM call in a worker thread so the event
+    # loop keeps serving status polls meanwhile
+    return await asyncio.to_thread(_answer_sync, req)
+
+@app.post("/answer/stream")
+def answer_stream(req: AnswerRequest, x_api_key: Optional[str] = Header(default=None)):
+    """Like /answer, but streams the answer as Server-Sent Events.
+
+    Emits `data: {"token": ...}` frames as Watsonx generates text, then one
+    `event: sources` frame, so the first words show up after prefill rather
+    than after the whole completion.
+    """
+    if API_KEY and x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    if req.run_id:
+        os.environ["RUN_ID"] = req.run_id
+        if not os.getenv("SITE_NAME"):
+            os.environ["SITE_NAME"] = "hprc.in"  # Default for now
+
+    from query_astra_llm import retrieve, answer_with_llm_stream
+
+    def events():
+        try:
+            docs = retrieve(req.query)
+            if not docs:
+                yield f"data: {dump_json({'token': 'No results in Astra DB.'}).decode()}\n\n"
+            else:
+                for tok in answer_with_llm_stream(req.query, docs):
+                    yield f"data: {dump_json({'token': tok}).decode()}\n\n"
+            sources = [
+                {"url": d.get("url"), "title": d.get("title"), "score": d.get("$similarity", 0)}
+                for d in docs
+            ]
+            yield f"event: sources\ndata: {dump_json(sources).decode()}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {dump_json({'error': str(e)}).decode()}\n\n"
+
+    # sync generator → Starlette iterates it in a worker thread
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 @app.post("/chat/test")
-def test_chatbot(req: AnswerRequest, x_api_key: Optional[str] = Header(default=None)):
+async def test_chatbot(req: AnswerRequest, x_api_key: Optional[str] = Header(default=None)):
     """Test the chatbot with a sample query (like the terminal 'Ask:' prompt)."""
     # optional auth
     if API_KEY and x_api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    # Use the same logic as query_astra_llm.py
-    try:
-        # Set environment variables for the specific run_id if provided
-        if req.run_id:
-            os.environ["RUN_ID"] = req.run_id
-            # Set up the Astra DB environment variables for this run
-            # Use the current server's Astra DB configuration
-            if os.getenv("ASTRA_DB_API_ENDPOINT"):
-                os.environ["ASTRA_DB_API_ENDPOINT"] = os.getenv("ASTRA_DB_API_ENDPOINT")
-            if os.getenv("ASTRA_DB_APPLICATION_TOKEN"):
-                os.environ["ASTRA_DB_APPLICATION_TOKEN"] = os.getenv("ASTRA_DB_APPLICATION_TOKEN")
-            # Set SITE_NAME based on run_id (extract from run_id or use default)
-            if not os.getenv("SITE_NAME"):
-                os.environ["SITE_NAME"] = "hprc.in"  # Default for now
-        
-        # Import the retrieve_and_answer function from query_astra_llm
-        import sys
-        sys.path.append('.')
-        from query_astra_llm import retrieve_and_answer
-        
-        # Call the same function that the terminal uses
-        result = retrieve_and_answer(req.query)
-        
-        # Format sources for frontend
-        sources = []
-        for doc in result.get("sources", []):
-            sources.append({
-                "url": doc.get("url"),
-                "title": doc.get("title"),
-                "score": doc.get("$similarity", 0)
-            })
-        
-        return {"answer": result.get("answer", "No answer available"), "sources": sources}
-        
-    except Exception as e:
-        return {"answer": f"Error processing query: {str(e)}", "sources": []}
+    return await asyncio.to_thread(_answer_sync, req)
 
 # Serve React app for all non-API routes (SPA routing)
 @app.get("/{full_path:path}")
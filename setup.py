@@ -7,6 +7,7 @@ Installs all dependencies and pre-loads models to ensure smooth pipeline executi
 import sys
 import subprocess
 import os
+import tempfile
 from pathlib import Path
 
 def run_command(cmd, description):
@@ -26,21 +27,53 @@ def run_command(cmd, description):
         print(f"   ❌ {description} failed with exception: {e}")
         return False
 
+def start_command(cmd, description):
+    """Start a command in the background; pair with finish_command()."""
+    print(f"\n🔄 {description} (in background)...")
+    print(f"   Command: {' '.join(cmd)}")
+    # stderr goes to a temp file rather than a pipe, so a chatty command can't
+    # block on a full pipe while we're waiting on the other one
+    err = tempfile.TemporaryFile()
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=err), err
+
+def finish_command(started, description):
+    """Wait for a start_command() process and report like run_command()."""
+    proc, err = started
+    with err:
+        if proc.wait() == 0:
+            print(f"   ✅ {description} completed successfully")
+            return True
+        err.seek(0)
+        print(f"   ❌ {description} failed:")
+        print(f"   Error: {err.read().decode(errors='replace')}")
+        return False
+
 def install_python_dependencies():
-    """Install Python dependencies from requirements.txt."""
+    """Install Python dependencies from requirements.txt, plus Playwright's chromium."""
     if not Path("requirements.txt").exists():
         print("❌ requirements.txt not found!")
         return False
     
-    return run_command([
-        sys.executable, "-m", "pip", "install", "-r", "requirements.txt"
-    ], "Installing Python dependencies")
+    # The browser download only needs the playwright package itself, so install
+    # that first and fetch chromium while pip works through the rest
+    if not run_command([
+        sys.executable, "-m", "pip", "install", "-U", "pip", "wheel"
+    ], "Upgrading pip"):
+        return False
+    if not run_command([
+        sys.executable, "-m", "pip", "install", "--prefer-binary", "playwright"
+    ], "Installing Playwright"):
+        return False
 
-def install_playwright_browsers():
-    """Install Playwright browsers."""
-    return run_command([
+    browsers = start_command([
         sys.executable, "-m", "playwright", "install", "chromium"
     ], "Installing Playwright browsers")
+    deps = start_command([
+        sys.executable, "-m", "pip", "install", "--prefer-binary", "-r", "requirements.txt"
+    ], "Installing Python dependencies")
+
+    ok = finish_command(deps, "Installing Python dependencies")
+    return finish_command(browsers, "Installing Playwright browsers") and ok
 
 def check_env_file():
     """Check if .env file exists and is properly configured."""
@@ -56,7 +89,7 @@ def check_env_file():
 def run_dependency_check():
     """Run the comprehensive dependency check."""
     return run_command([
-        sys.executable, "check_dependencies.py"
+        sys.executable, "check_dependencies.py", "--preload"
     ], "Running dependency check")
 
 def main():
@@ -71,14 +104,10 @@ def main():
     
     success = True
     
-    # Step 1: Install Python dependencies
+    # Step 1+2: Install Python dependencies and Playwright browsers (overlapped)
     if not install_python_dependencies():
         success = False
     
-    # Step 2: Install Playwright browsers
-    if not install_playwright_browsers():
-        success = False
-    
     # Step 3: Check .env file
     if not check_env_file():
         success = False
@@ -1,27 +1,37 @@
 import os
 from dotenv import load_dotenv
-from astrapy import DataAPIClient
-from sentence_transformers import SentenceTransformer
+from astra_client import get_collection
+from query_cache import cached_find
+import content_cache
 
 load_dotenv()
-cl = DataAPIClient(os.getenv("ASTRA_DB_APPLICATION_TOKEN"))\
-     .get_database_by_api_endpoint(os.getenv("ASTRA_DB_API_ENDPOINT"))\
-     .get_collection(os.getenv("ASTRA_COLLECTION_NAME","chatbot_chunks"))
+cl = get_collection()
 
 SITE = os.getenv("SITE_NAME","incede-dev.netlify.app")
 URL = "https://incede-dev.netlify.app/services/gen-ai-implementation/custom-foundation-model-training"
+MODEL_NAME = "all-mpnet-base-v2"
 
-# encode query
-model = SentenceTransformer("all-mpnet-base-v2")
+class LazyModel:
+    """Loads the SentenceTransformer on first encode, i.e. only on a cache miss."""
+    _model = None
+
+    def encode(self, *args, **kwargs):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            LazyModel._model = SentenceTransformer(MODEL_NAME)
+        return self._model.encode(*args, **kwargs)
+
+# encode query (shares the upload pipeline's embedding cache, so a repeat run skips the model)
 q = "What models does incede support?"
-qvec = model.encode(q).tolist()
+qvec = content_cache.encode_cached(LazyModel(), MODEL_NAME, [q])[0].tolist()
 
-# run ANN query restricted to this page only
-docs = cl.find({"site_name": SITE, "url": URL},
-               sort={"$vector": qvec}, limit=5,
-               projection={"url":1,"chunk_index":1,"text":1})
+# run ANN query restricted to this page only (cached for FIND_CACHE_TTL seconds)
+docs = cached_find(cl, {"site_name": SITE, "url": URL},
+                   key_parts=(os.getenv("ASTRA_DB_API_ENDPOINT"), cl.name, q),
+                   sort={"$vector": qvec}, limit=5,
+                   projection={"url":1,"chunk_index":1,"text":1})
 
 print("\n=== Top Results ===")
 for i,d in enumerate(docs):
     print(f"[{i}] url={d.get('url')} chunk={d.get('chunk_index')}")
-    print((d.get("text") or "")[:250], "...\n")
\ No newline at end of file
+    print((d.get("text") or "")[:250], "...\n")
@@ -1,21 +1,45 @@
 import os
-import json
+import copy
+import queue
 import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
-from astrapy import DataAPIClient
+from astra_client import get_collection
+from astrapy.data_types import DataAPIVector
+from astrapy.exceptions import CollectionInsertManyException
 from sentence_transformers import SentenceTransformer
+import torch
+import numpy as np
+import content_cache
+from parsed_io import read_json
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Load .env
 # ──────────────────────────────────────────────────────────────────────────────
 load_dotenv()
 
-ASTRA_DB_API_ENDPOINT = os.getenv("ASTRA_DB_API_ENDPOINT")
-ASTRA_DB_APPLICATION_TOKEN = os.getenv("ASTRA_DB_APPLICATION_TOKEN")
 COLLECTION_NAME = os.getenv("ASTRA_COLLECTION_NAME", "chatbot_chunks")
 
-SITE_NAME = os.getenv("SITE_NAME", "unknown_site")
+# Also index each chunk for BM25 ($lexical) so hybrid search can use it;
+# the collection must have been created with ASTRA_HYBRID=1
+ASTRA_HYBRID = os.getenv("ASTRA_HYBRID", "0") == "1"
+# Concurrent insert requests for a page larger than one insert request
+# (astrapy sends INSERT_CHUNK_SIZE documents per request)
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "8"))
+INSERT_CHUNK_SIZE = 50
+# Chunks per encoder forward pass; main() also pools several pages' chunks
+# into one encode call so short pages still fill a batch
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# upload_files() stage widths: page readers, and pages being upserted at once.
+# Most pages are a single insert_many request, so UPLOAD_WORKERS is the number
+# of requests in flight; they share astra_client's HTTP/2 pool, which
+# multiplexes them over one or two connections.
+READ_WORKERS = int(os.getenv("READ_WORKERS", "4"))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "16"))
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Handle run_id
@@ -30,41 +54,126 @@ def get_latest_run_folder():
         raise RuntimeError("No valid run folders found in data/") 
     return str(sorted(runs)[-1].name)
 
-if len(sys.argv) > 1:
-    RUN_ID = sys.argv[1]
-else:
-    RUN_ID = get_latest_run_folder()
+# ──────────────────────────────────────────────────────────────────────────────
+# Embedding model
+# ──────────────────────────────────────────────────────────────────────────────
+EMBEDDER_MODEL_NAME = "all-mpnet-base-v2"
 
-BASE_DIR = Path("data") / RUN_ID
-PARSED = BASE_DIR / "parsed"
+# GPU + fp16 when available (same policy as query_astra_llm); CPU stays fp32
+MODEL_DEVICE = os.getenv("MODEL_DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
+USE_FP16 = MODEL_DEVICE.startswith("cuda")
 
-if not PARSED.exists():
-    raise RuntimeError(f"Parsed folder not found: {PARSED}")
+# Pin the token window explicitly: a 1200-char chunk is ~250-300 tokens, so
+# batches pad to their longest chunk well under this cap
+EMBED_MAX_SEQ_LENGTH = int(os.getenv("EMBED_MAX_SEQ_LENGTH", "384"))
 
-# ──────────────────────────────────────────────────────────────────────────────
-# Connect to Astra DB
-# ──────────────────────────────────────────────────────────────────────────────
-client = DataAPIClient(ASTRA_DB_APPLICATION_TOKEN)
-db = client.get_database_by_api_endpoint(ASTRA_DB_API_ENDPOINT)
-collection = db.get_collection(COLLECTION_NAME)
+# Optional ONNX Runtime backend for CPU-only hosts (needs `pip install onnxruntime`).
+# Point EMBED_ONNX_DIR at an export of the same model, e.g.
+#   optimum-cli export onnx --model sentence-transformers/all-mpnet-base-v2 --optimize O3 onnx_mpnet/
+# optionally int8-quantized (onnxruntime.quantization.quantize_dynamic) to model_quantized.onnx.
+EMBED_ONNX_DIR = os.getenv("EMBED_ONNX_DIR")
 
-# ──────────────────────────────────────────────────────────────────────────────
-# Embedding model
-# ──────────────────────────────────────────────────────────────────────────────
-model = SentenceTransformer("all-mpnet-base-v2")
+class OnnxEmbedder:
+    """The subset of SentenceTransformer.encode we use, over an ONNX export.
+
+    Applies the same mean pooling + L2 normalisation as all-mpnet-base-v2's
+    own Pooling/Normalize modules.
+    """
+    def __init__(self, model_dir: str, max_seq_length: int):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = Path(model_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.intra_op_num_threads = os.cpu_count() or 1
+        onnx_path = model_dir / "model_quantized.onnx"
+        if not onnx_path.exists():
+            onnx_path = model_dir / "model.onnx"
+        self.session = ort.InferenceSession(str(onnx_path), opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.max_seq_length = max_seq_length
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False, normalize_embeddings=True):
+        # Batch similar lengths together (as SentenceTransformer.encode does)
+        # so short chunks aren't padded out to a long neighbour
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        texts = [texts[i] for i in order]
+        out = []
+        for i in range(0, len(texts), batch_size):
+            enc = self.tokenizer(
+                texts[i:i + batch_size], padding=True, truncation=True,
+                max_length=self.max_seq_length, return_tensors="np",
+            )
+            hidden = self.session.run(None, {k: v for k, v in enc.items() if k in self.input_names})[0]
+            mask = enc["attention_mask"][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            out.append(pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None))
+        vecs = np.empty((len(texts), out[0].shape[1]), dtype=np.float32)
+        vecs[order] = np.concatenate(out)
+        return vecs
+
+if EMBED_ONNX_DIR:
+    model = OnnxEmbedder(EMBED_ONNX_DIR, EMBED_MAX_SEQ_LENGTH)
+    # different runtime (and maybe int8) → don't share cached vectors with PyTorch
+    EMBED_CACHE_NAME = f"{EMBEDDER_MODEL_NAME}@onnx:{Path(EMBED_ONNX_DIR).name}"
+else:
+    model = SentenceTransformer(EMBEDDER_MODEL_NAME, device=MODEL_DEVICE)
+    if USE_FP16:
+        model.half()
+    model.max_seq_length = EMBED_MAX_SEQ_LENGTH
+    EMBED_CACHE_NAME = EMBEDDER_MODEL_NAME
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Chunking function
 # ──────────────────────────────────────────────────────────────────────────────
 def chunk_text(text, chunk_size=1200, overlap=200):
-    chunks = []
-    for i in range(0, len(text), chunk_size - overlap):
-        chunks.append(text[i:i + chunk_size])
-    return chunks
+    # Stop once a window reaches the end of the text: the old loop kept going
+    # and emitted a tail chunk lying wholly inside the previous one, which
+    # then got embedded and stored for nothing
+    step = chunk_size - overlap
+    last_start = max(len(text) - overlap, 1) if text else 0
+    return [text[i:i + chunk_size] for i in range(0, last_start, step)]
+
+# CHUNK_BY_TOKENS=1 sizes chunks in model tokens instead of characters, so
+# none is silently truncated at max_seq_length (dense or non-Latin text can
+# run past it at 1200 chars) and the encoder gets near-uniform lengths.
+# Changes every page's chunks, so expect one full re-embed after switching.
+CHUNK_BY_TOKENS = os.getenv("CHUNK_BY_TOKENS", "0") == "1"
+CHUNK_TOKENS = 256
+CHUNK_OVERLAP_TOKENS = 48
+CHUNKING_STRATEGY = (
+    f"{CHUNK_TOKENS}_tokens_with_{CHUNK_OVERLAP_TOKENS}_overlap" if CHUNK_BY_TOKENS
+    else "1200_bytes_with_200_overlap"
+)
+# Private copy: the encoder reconfigures its tokenizer's truncation on every
+# call, which a fast tokenizer can't have happening under a concurrent
+# call from a reader thread
+_chunk_tokenizer = copy.deepcopy(model.tokenizer) if CHUNK_BY_TOKENS else None
+_chunk_tokenizer_lock = threading.Lock()
+
+def chunk_tokens(text, chunk_size=CHUNK_TOKENS, overlap=CHUNK_OVERLAP_TOKENS):
+    """chunk_text() with the window measured in tokens.
+
+    Chunks are sliced out of the original text via token offsets, so case
+    and spacing survive (decoding the ids would lowercase them).
+    """
+    with _chunk_tokenizer_lock:
+        offsets = _chunk_tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, verbose=False,
+        )["offset_mapping"]
+    step = chunk_size - overlap
+    last_start = max(len(offsets) - overlap, 1) if offsets else 0
+    return [
+        text[offsets[i][0]:offsets[min(i + chunk_size, len(offsets)) - 1][1]]
+        for i in range(0, last_start, step)
+    ]
 
 # ──────────────────────────────────────────────────────────────────────────────
 # URL normalizer: treat hash anchors as path segments
 # ──────────────────────────────────────────────────────────────────────────────
+@lru_cache(maxsize=50_000)  # pure, and the same urls recur across runs in one process
 def anchor_to_path(u: str) -> str:
     if not u:
         return u
@@ -78,48 +187,221 @@ def anchor_to_path(u: str) -> str:
 # ──────────────────────────────────────────────────────────────────────────────
 # Upload with UPSERT
 # ──────────────────────────────────────────────────────────────────────────────
-print(f"📤 Uploading data from run_id: {RUN_ID} | site: {SITE_NAME}")
-
-count = 0
-for file_path in PARSED.glob("*.json"):
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+def read_page(file_path: Path):
+    """(data, url, chunks) for one parsed page, or None if it has no text."""
+    data = read_json(file_path)
 
     text = data.get("text", "")
     if not text.strip():
-        continue
+        return None
 
     # Apply chunking strategy
-    chunks = chunk_text(text)
+    chunks = chunk_tokens(text) if CHUNK_BY_TOKENS else chunk_text(text)
 
     # Normalized URL (anchor → path)
-    url_raw = data.get("url")
-    url = anchor_to_path(url_raw)
+    url = anchor_to_path(data.get("url"))
+    return data, url, chunks
 
-    # Insert/update each chunk
-    for idx, chunk in enumerate(chunks):
-        embedding = model.encode(chunk).tolist()
+# Recently computed vectors, keyed by chunk hash. Boilerplate (nav, footer,
+# CTA blocks) repeats on every page of a site; each copy is embedded once per
+# run even with the content cache off. LRU-bounded (~3 KB per entry), since
+# the server runs pipeline after pipeline in one process.
+EMBED_SEEN_MAX = int(os.getenv("EMBED_SEEN_MAX", "10000"))
+_seen: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_seen_lock = threading.Lock()
 
-        # Unique key = site_name + url + chunk_index
-        filter_key = {
-            "site_name": SITE_NAME,
-            "url": url,
-            "chunk_index": idx
-        }
+def embed(chunks: list[str]) -> np.ndarray:
+    if not chunks:
+        return np.empty((0, 0), dtype=np.float32)
+    keys = [content_cache.content_hash(c) for c in chunks]
+    found = {}
+    with _seen_lock:
+        for k in keys:
+            if k in _seen:
+                _seen.move_to_end(k)
+                found[k] = _seen[k]
+    new = {k: c for k, c in zip(keys, chunks) if k not in found}
+    if new:
+        # Unchanged chunks reuse their vector from a previous run. inference_mode
+        # is per-thread, and run_all calls this from its page workers.
+        with torch.inference_mode():
+            vecs = content_cache.encode_cached(
+                model, EMBED_CACHE_NAME, list(new.values()),
+                batch_size=EMBED_BATCH_SIZE, show_progress_bar=False, normalize_embeddings=True,
+            )
+        found.update(zip(new, vecs))
+        with _seen_lock:
+            _seen.update(zip(new, vecs))
+            while len(_seen) > EMBED_SEEN_MAX:
+                _seen.popitem(last=False)
+    return np.stack([found[k] for k in keys])
 
+class NumpyVector(DataAPIVector):
+    """DataAPIVector over a float32 row, binary-encoded straight from numpy.
+
+    astrapy's own to_bytes() struct-packs a Python list, so the row would
+    be boxed into 768 floats per chunk first. .data still gives a list, for
+    clients with binary vector encoding turned off.
+    """
+    def __init__(self, row: np.ndarray):
+        self.row = row
+        self.n = len(row)
+
+    @property
+    def data(self) -> list[float]:
+        return self.row.tolist()
+
+    def to_bytes(self) -> bytes:
+        return self.row.astype(">f4").tobytes()  # big-endian, the Data API convention
+
+def upsert_page(collection, data: dict, url: str, chunks: list[str], embeddings, run_id: str, site_name: str) -> int:
+    """Upsert one page's chunks with their precomputed embeddings."""
+    docs = []
+    for idx, chunk in enumerate(chunks):
         doc = {
-            "run_id": RUN_ID,
-            "site_name": SITE_NAME,
+            # Unique key = site_name + url + chunk_index, as the primary key, so
+            # a page goes up in one insert_many instead of one upsert per chunk.
+            # Hashed: fixed 32 chars however long the URL
+            "_id": content_cache.content_hash(site_name, url, str(idx)),
+            "run_id": run_id,
+            "site_name": site_name,
             "url": url,
             "title": data.get("title"),
             "page_type": data.get("page_type"),
             "chunk_index": idx,
-            "chunking_strategy": "1200_bytes_with_200_overlap",
+            "chunking_strategy": CHUNKING_STRATEGY,
             "text": chunk,
-            "$vector": embedding
+            # packed float32 on the wire (Astra has no fp16/int8 collection vectors)
+            "$vector": NumpyVector(embeddings[idx])
         }
+        if ASTRA_HYBRID:
+            doc["$lexical"] = chunk
+        docs.append(doc)
+
+    # Write first, so the page's rows are never missing: ids are deterministic,
+    # so chunks that already exist (a re-crawl) fail the insert and are
+    # overwritten in place. On a re-upload that costs one request per chunk.
+    try:
+        # A page within one insert request needs no astrapy worker pool
+        collection.insert_many(
+            docs, ordered=False,
+            concurrency=1 if len(docs) <= INSERT_CHUNK_SIZE else UPLOAD_CONCURRENCY,
+        )
+    except CollectionInsertManyException as e:
+        inserted = set(e.inserted_ids)
+        redo = [d for d in docs if d["_id"] not in inserted]
+        with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as ex:
+            list(ex.map(lambda d: collection.replace_one({"_id": d["_id"]}, d, upsert=True), redo))
+
+    # Then drop this page's rows that weren't just written: chunks past a
+    # shrunken page's new end, and rows stored under an older _id scheme
+    collection.delete_many({"site_name": site_name, "url": url, "_id": {"$nin": [d["_id"] for d in docs]}})
+    return len(docs)
+
+def upload_file(collection, file_path: Path, run_id: str, site_name: str) -> int:
+    """Embed and upsert one parsed page's chunks; returns the number written."""
+    page = read_page(file_path)
+    if page is None:
+        return 0
+    data, url, chunks = page
+    # One batched forward pass for the whole page instead of one per chunk
+    return upsert_page(collection, data, url, chunks, embed(chunks), run_id, site_name)
+
+_DONE = object()  # end-of-stream marker, one per reader thread
+
+def upload_files(collection, file_paths, run_id: str, site_name: str) -> int:
+    """Like upload_file over many pages, with the stages overlapped.
+
+    READ_WORKERS threads read + chunk pages into a bounded queue; this thread
+    pools them until they hold a few batches' worth of chunks (so the encoder
+    sees full batches even when most pages are one or two chunks) and encodes;
+    UPLOAD_WORKERS threads upsert the encoded pages. Disk, encoder and network
+    then work at the same time instead of taking turns.
+    """
+    paths = iter(file_paths)
+    paths_lock = threading.Lock()
+    pages = queue.Queue(maxsize=32)
+    stop = threading.Event()  # set if the encoder side fails, so readers don't block forever
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def reader():
+        try:
+            while not stop.is_set():
+                with paths_lock:
+                    path = next(paths, None)
+                if path is None:
+                    return
+                page = read_page(path)
+                if page is not None:
+                    put(page)
+        finally:
+            put(_DONE)
+
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as rx, ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as ux:
+        readers = [rx.submit(reader) for _ in range(READ_WORKERS)]
+        uploads = []
+        pending = []  # (data, url, chunks)
+        n_pending = 0
+
+        def flush():
+            nonlocal pending, n_pending
+            if not pending:
+                return
+            embeddings = embed([c for _, _, chunks in pending for c in chunks])
+            start = 0
+            for data, url, chunks in pending:
+                uploads.append(ux.submit(
+                    upsert_page, collection, data, url, chunks,
+                    embeddings[start:start + len(chunks)], run_id, site_name,
+                ))
+                start += len(chunks)
+            pending, n_pending = [], 0
+
+        try:
+            live = READ_WORKERS
+            while live:
+                page = pages.get()
+                if page is _DONE:
+                    live -= 1
+                    continue
+                pending.append(page)
+                n_pending += len(page[2])
+                if n_pending >= EMBED_BATCH_SIZE * 4:
+                    flush()
+            flush()
+        finally:
+            stop.set()
+
+        for r in readers:
+            r.result()  # re-raise a read error
+        return sum(f.result() for f in uploads)
+
+def main(run_id: str | None = None):
+    run_id = run_id or get_latest_run_folder()
+    parsed = Path("data") / run_id / "parsed"
+    if not parsed.exists():
+        raise RuntimeError(f"Parsed folder not found: {parsed}")
+
+    # Connect at call time: run_all/ensure_db set the Astra env after import
+    collection = get_collection(COLLECTION_NAME)
+    site_name = os.getenv("SITE_NAME", "unknown_site")
+
+    print(f"📤 Uploading data from run_id: {run_id} | site: {site_name}")
+
+    count = upload_files(collection, parsed.glob("*.json"), run_id, site_name)
 
-        collection.update_one(filter_key, {"$set": doc}, upsert=True)
-        count += 1
+    print(f"✅ Uploaded/updated {count} documents to collection '{COLLECTION_NAME}' in Astra DB")
 
-print(f"✅ Uploaded/updated {count} documents to collection '{COLLECTION_NAME}' in Astra DB")
\ No newline at end of file
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--no-cache" in args:  # re-embed everything, ignoring the embedding cache
+        args.remove("--no-cache")
+        content_cache.CONTENT_CACHE_ENABLED = False
+    main(args[0] if args else None)
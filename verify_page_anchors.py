@@ -1,9 +1,10 @@
 # verify_page_anchors.py
-import os, sys
-from collections import defaultdict
+import heapq, os, sys
+from itertools import groupby
+from operator import itemgetter
 from urllib.parse import urldefrag
 from dotenv import load_dotenv, find_dotenv
-from astrapy import DataAPIClient
+from astra_client import get_collection
 
 load_dotenv(find_dotenv(usecwd=True), override=True)
 
@@ -18,36 +19,54 @@ if not ENDPOINT or not TOKEN:
 TARGET = sys.argv[1] if len(sys.argv) > 1 else "https://incede-dev.netlify.app/services/gen-ai-implementation#ai-powered-web-agent"
 BASE, _ = urldefrag(TARGET)
 
-cl = DataAPIClient(TOKEN).get_database_by_api_endpoint(ENDPOINT).get_collection(COLL)
+cl = get_collection(COLL)
+
+def fetch_text_for(ids):
+    """{_id: text} for just these documents, in one request."""
+    return {d["_id"]: d.get("text") for d in cl.find({"_id": {"$in": list(ids)}}, projection={"text": 1})}
+
+def first_chunks(docs, n=2):
+    """The n lowest-index chunks of docs, with their text filled in."""
+    docs = heapq.nsmallest(n, docs, key=lambda x: x.get("chunk_index", 0))
+    text = fetch_text_for(d["_id"] for d in docs)
+    return [{**d, "text": text.get(d["_id"])} for d in docs]
 
 # 1) STRICT exact match — no fallback.
-exact = list(cl.find({"site_name": SITE, "url": TARGET}, limit=1000))
+exact = list(cl.find({"site_name": SITE, "url": TARGET}, projection={"_id": 1, "url": 1, "chunk_index": 1}, limit=1000))
 print(f"[EXACT] {TARGET} -> {len(exact)} chunk(s)")
 
-# 2) Group all chunks under BASE and its anchors (client-side).
-pool = list(cl.find({"site_name": SITE}, fields={"url":1,"chunk_index":1,"text":1}, limit=10000))
-groups = defaultdict(list)
-for d in pool:
-    u = d.get("url")
-    if isinstance(u, str) and (u == BASE or u.startswith(BASE + "#")):
-        groups[u].append(d)
+# 2) Group all chunks under BASE and its anchors. url in [BASE, BASE + "#\uffff"]
+#    is a server-side prefix match; text is fetched for the sample only.
+pool = list(cl.find(
+    {"site_name": SITE, "url": {"$gte": BASE, "$lte": BASE + "#\uffff"}},
+    projection={"_id": 1, "url": 1, "chunk_index": 1},
+    limit=500
+))
+# The range above also admits urls like BASE + "!x" (sorting before "#"); keep BASE and
+# BASE#..., grouped in one sorted pass (groups come out in url order)
+ANCHOR = BASE + "#"
+under = sorted(
+    (d for d in pool if isinstance(d.get("url"), str) and (d["url"] == BASE or d["url"].startswith(ANCHOR))),
+    key=itemgetter("url"),
+)
+groups = {u: list(g) for u, g in groupby(under, key=itemgetter("url"))}
 
 print(f"\n[GROUPS under BASE] {BASE}")
-for u in sorted(groups.keys()):
+for u in groups:
     print(f"  {u} -> {len(groups[u])} chunk(s)")
 
 # 3) If exact exists, show a quick sample; else show closest anchor present
 if exact:
     print("\n[SAMPLE from EXACT]")
-    for d in sorted(exact, key=lambda x: x.get("chunk_index", 0))[:2]:
+    for d in first_chunks(exact):
         print(f"- {d.get('url')} | chunk {d.get('chunk_index')}")
         print((d.get('text') or '')[:200], "...\n")
 else:
     # show top 2 chunks from #gen if that's what exists
-    for u in sorted(groups.keys()):
+    for u in groups:
         if u != BASE:
             print("\n[NEAREST EXISTING ANCHOR SAMPLE]")
-            for d in sorted(groups[u], key=lambda x: x.get("chunk_index", 0))[:2]:
+            for d in first_chunks(groups[u]):
                 print(f"- {d.get('url')} | chunk {d.get('chunk_index')}")
                 print((d.get('text') or '')[:200], "...\n")
             break
\ No newline at end of file
@@ -1,9 +1,10 @@
 # verify_page_anchors_v2.py  (SCRIPT_VERSION=V2_PROJECTION_ONLY)
-import os, sys
-from collections import defaultdict
+import heapq, os, sys
+from itertools import groupby
+from operator import itemgetter
 from urllib.parse import urldefrag
 from dotenv import load_dotenv, find_dotenv
-from astrapy import DataAPIClient
+from astra_client import get_collection
 
 print(">> RUNNING verify_page_anchors_v2.py (V2_PROJECTION_ONLY)")
 
@@ -21,40 +22,53 @@ TARGET = sys.argv[1] if len(sys.argv) > 1 else \
     "https://incede-dev.netlify.app/services/gen-ai-implementation#ai-powered-web-agent"
 BASE, _ = urldefrag(TARGET)
 
-cl = DataAPIClient(TOKEN).get_database_by_api_endpoint(ENDPOINT).get_collection(COLL)
+cl = get_collection(COLL)
+
+def fetch_text_for(ids):
+    """{_id: text} for just these documents, in one request."""
+    return {d["_id"]: d.get("text") for d in cl.find({"_id": {"$in": list(ids)}}, projection={"text": 1})}
+
+def first_chunks(docs, n=2):
+    """The n lowest-index chunks of docs, with their text filled in."""
+    docs = heapq.nsmallest(n, docs, key=lambda x: x.get("chunk_index", 0))
+    text = fetch_text_for(d["_id"] for d in docs)
+    return [{**d, "text": text.get(d["_id"])} for d in docs]
 
 # 1) STRICT exact match
-exact = list(cl.find({"site_name": SITE, "url": TARGET}, limit=1000))
+exact = list(cl.find({"site_name": SITE, "url": TARGET}, projection={"_id": 1, "url": 1, "chunk_index": 1}, limit=1000))
 print(f"[EXACT] {TARGET} -> {len(exact)} chunk(s)")
 
-# 2) Pull all chunks for this site (NOTE: projection=, not fields=)
+# 2) Only this page and its anchors: url in [BASE, BASE + "#\uffff"] is a
+#    server-side prefix match, and text is left out (fetched for the sample only)
 pool = list(cl.find(
-    {"site_name": SITE},
-    projection={"url": 1, "chunk_index": 1, "text": 1},
-    limit=10000
+    {"site_name": SITE, "url": {"$gte": BASE, "$lte": BASE + "#\uffff"}},
+    projection={"_id": 1, "url": 1, "chunk_index": 1},
+    limit=500
 ))
 
-# Group by anchor
-groups = defaultdict(list)
-for d in pool:
-    u = d.get("url")
-    if isinstance(u, str) and (u == BASE or u.startswith(BASE + "#")):
-        groups[u].append(d)
+# The range above also admits urls like BASE + "!x" (sorting before "#"); keep BASE and
+# BASE#..., grouped in one sorted pass (groups come out in url order)
+ANCHOR = BASE + "#"
+under = sorted(
+    (d for d in pool if isinstance(d.get("url"), str) and (d["url"] == BASE or d["url"].startswith(ANCHOR))),
+    key=itemgetter("url"),
+)
+groups = {u: list(g) for u, g in groupby(under, key=itemgetter("url"))}
 
 print(f"\n[GROUPS under BASE] {BASE}")
-for u in sorted(groups.keys()):
+for u in groups:
     print(f"  {u} -> {len(groups[u])} chunk(s)")
 
 # 3) Show sample
 if exact:
     print("\n[SAMPLE from EXACT]")
-    for d in sorted(exact, key=lambda x: x.get("chunk_index", 0))[:2]:
+    for d in first_chunks(exact):
         print(f"- {d.get('url')} | chunk {d.get('chunk_index')}")
         print((d.get('text') or '')[:200], "...\n")
 elif groups:
     print("\n[NEAREST EXISTING ANCHOR SAMPLE]")
-    first_anchor = next((u for u in sorted(groups.keys()) if u != BASE), None)
+    first_anchor = next((u for u in groups if u != BASE), None)
     if first_anchor:
-        for d in sorted(groups[first_anchor], key=lambda x: x.get("chunk_index", 0))[:2]:
+        for d in first_chunks(groups[first_anchor]):
             print(f"- {d.get('url')} | chunk {d.get('chunk_index')}")
             print((d.get('text') or '')[:200], "...\n")
\ No newline at end of file
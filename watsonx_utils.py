@@ -0,0 +1,82 @@
+# watsonx_utils.py
+import json, os, threading, time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import llm_cache
+
+IAM_TOKEN_URL = "https://iam.cloud.ibm.com/identity/token"
+TOKEN_REFRESH_MARGIN_S = 60  # refresh this long before IAM says the token expires
+
+# Shared keep-alive pool for IAM + Watsonx calls; sized for the detect scripts'
+# concurrent workers. Chat/token POSTs have no side effects, so retrying is safe.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=3, backoff_factor=0.3, status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST"}),
+    ),
+))
+
+# IAM tokens live ~1h; mint one and share it across calls (and threads)
+_TOKEN_CACHE = {"token": None, "exp": 0.0}
+_TOKEN_LOCK = threading.Lock()
+
+def get_watsonx_token() -> str:
+    with _TOKEN_LOCK:
+        if _TOKEN_CACHE["token"] and time.time() < _TOKEN_CACHE["exp"]:
+            return _TOKEN_CACHE["token"]
+
+        apikey = os.getenv("IBM_API_KEY")
+        if not apikey:
+            raise RuntimeError("Missing IBM_API_KEY")
+        resp = SESSION.post(
+            IAM_TOKEN_URL,
+            data={
+                "grant_type": "urn:ibm:params:oauth:grant-type:apikey",
+                "apikey": apikey,
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            timeout=30,
+        )
+        resp.raise_for_status()
+        body = resp.json()
+        _TOKEN_CACHE["token"] = body["access_token"]
+        _TOKEN_CACHE["exp"] = time.time() + float(body.get("expires_in", 3600)) - TOKEN_REFRESH_MARGIN_S
+        return _TOKEN_CACHE["token"]
+
+def cached_chat(model_id: str, messages, max_tokens: int, call, *, temperature: float = 0):
+    """call() (one Watsonx chat round-trip), reusing a stored answer for the same request.
+
+    Only temperature=0 calls are deterministic, so only those go through llm_cache.
+    """
+    if temperature != 0:
+        return call()
+    key = llm_cache.make_key(model_id, messages, max_tokens)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+    out = call()
+    llm_cache.put(key, out)
+    return out
+
+_JSON_DECODER = json.JSONDecoder()
+
+def extract_first_json_object(s: str):
+    """Parse and return the first valid JSON object embedded in s, or None.
+
+    Brace matching and validation both happen in the C decoder (raw_decode),
+    trying each "{" in turn until one starts a complete object.
+    """
+    if not s:
+        return None
+    i = s.find("{")
+    while i != -1:
+        try:
+            obj, _ = _JSON_DECODER.raw_decode(s, i)
+            return obj
+        except json.JSONDecodeError:
+            i = s.find("{", i + 1)
+    return None